@@ -15,6 +15,8 @@ from typing import Optional, TYPE_CHECKING
 
 from lib.ui import Colors, colorize, say, ok, warn, error
 from lib.instance import Instance
+from lib.utils.common import is_snapshot_name
+from lib.utils.catalog import ARCHIVE_PREFIX, forget_snapshots, load_catalog
 
 if TYPE_CHECKING:
     pass
@@ -58,76 +60,21 @@ class BackupManager:
         Returns:
             List of Snapshot objects sorted by name (oldest first)
         """
-        def get_snapshots_from_path(path: str, is_archive: bool = False) -> list[Snapshot]:
-            """Helper to fetch snapshots from a single path."""
-            result = subprocess.run(
-                ["rclone", "lsd", path],
-                capture_output=True, text=True, check=False
-            )
-            
-            if result.returncode != 0:
-                return []
-            
-            snaps = []
-            for line in result.stdout.splitlines():
-                if not line.strip():
-                    continue
-                parts = line.split()
-                if len(parts) >= 1:
-                    snap_name = parts[-1]
-                    
-                    # Skip the "archive" subfolder - it contains archive backups, not a snapshot itself
-                    if snap_name == "archive":
-                        continue
-                    
-                    # Get manifest info
-                    mode = "full"
-                    parent = ""
-                    created = ""
-                    
-                    manifest_result = subprocess.run(
-                        ["rclone", "cat", f"{path}/{snap_name}/manifest.yaml"],
-                        capture_output=True, text=True, check=False, timeout=10
-                    )
-                    
-                    if manifest_result.returncode == 0:
-                        for mline in manifest_result.stdout.splitlines():
-                            if ":" in mline:
-                                k, v = mline.split(":", 1)
-                                k, v = k.strip(), v.strip()
-                                if k == "mode":
-                                    mode = v
-                                elif k == "parent":
-                                    parent = v
-                                elif k == "created":
-                                    created = v[:19]  # Just date/time portion
-                    
-                    # Check for docker versions file
-                    has_docker = subprocess.run(
-                        ["rclone", "lsf", f"{path}/{snap_name}/docker-images.txt"],
-                        capture_output=True, check=False
-                    ).returncode == 0
-                    
-                    # For archive backups, prefix the name so restore knows where to find them
-                    display_name = f"archive/{snap_name}" if is_archive else snap_name
-                    
-                    snaps.append(Snapshot(
-                        name=display_name,
-                        mode="archive" if is_archive else mode,
-                        parent=parent,
-                        created=created,
-                        has_docker_versions=has_docker
-                    ))
-            
-            return snaps
-        
-        # Get standard snapshots
-        snapshots = get_snapshots_from_path(remote_path)
-        
-        # Also get archive snapshots if requested
-        if include_archives:
-            archive_snapshots = get_snapshots_from_path(f"{remote_path}/archive", is_archive=True)
-            snapshots.extend(archive_snapshots)
+        # One catalog read (plus one listing to catch snapshots it has not seen)
+        # instead of a manifest fetch and a docker-images.txt probe per snapshot
+        snapshots = []
+        for name, entry in load_catalog(remote_path).items():
+            is_archive = name.startswith(ARCHIVE_PREFIX)
+            if is_archive and not include_archives:
+                continue
+            manifest = entry.get("manifest", {})
+            snapshots.append(Snapshot(
+                name=name,
+                mode="archive" if is_archive else manifest.get("mode", "full"),
+                parent=manifest.get("parent", ""),
+                created=manifest.get("created", "")[:19],  # Just date/time portion
+                has_docker_versions=entry.get("has_docker_versions", False)
+            ))
         
         # Sort by name descending (newest first - names are date-based)
         snapshots.sort(key=lambda x: x.name, reverse=True)
@@ -355,7 +302,7 @@ def count_snapshots(remote_path: str) -> int:
     if result.returncode != 0:
         return 0
     
-    return len([l for l in result.stdout.splitlines() if l.strip()])
+    return len([l for l in result.stdout.splitlines() if l.strip() and is_snapshot_name(l.split()[-1])])
 
 
 def delete_snapshot(remote_path: str, snapshot_name: str) -> bool:
@@ -365,4 +312,6 @@ def delete_snapshot(remote_path: str, snapshot_name: str) -> bool:
         ["rclone", "purge", full_path],
         capture_output=True, check=False
     )
+    if result.returncode == 0:
+        forget_snapshots(remote_path, [snapshot_name])
     return result.returncode == 0
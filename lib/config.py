@@ -16,6 +16,9 @@ CLI_SYMLINK = "/usr/local/bin/paperless"
 # Where instance metadata is stored
 CONFIG_DIR = "/etc/paperless-bulletproof"
 
+# Where downloaded snapshot archives are cached for repeated restores (shared by all instances)
+ARTIFACT_CACHE_DIR = "/var/cache/paperless-bulletproof/artifacts"
+
 # Default paths for instances (can be overridden per-instance)
 DEFAULT_STACK_DIR = "/home/docker/paperless-setup"
 DEFAULT_DATA_ROOT = "/home/docker/paperless"
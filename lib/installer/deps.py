@@ -80,6 +80,8 @@ def install_prereqs() -> None:
         "lsb-release",
         "unzip",
         "tar",
+        "pigz",
+        "zstd",
         "cron",
         "software-properties-common",
         "dos2unix",
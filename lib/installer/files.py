@@ -4,6 +4,7 @@ import subprocess
 import sys
 import shutil
 from .common import cfg, say, log, ok, warn, confirm, prompt
+from lib.utils.common import is_snapshot_name
 
 BASE_DIR = Path(__file__).resolve().parent.parent.parent
 
@@ -77,6 +78,7 @@ def restore_existing_backup_if_present() -> bool:
     if res.returncode != 0:
         return False
     snaps = [line.split()[-1].rstrip("/") for line in res.stdout.splitlines() if line.strip()]
+    snaps = [s for s in snaps if is_snapshot_name(s)]
     if not snaps:
         return False
     snaps = sorted(snaps)
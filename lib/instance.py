@@ -11,11 +11,13 @@ import os
 import shutil
 import subprocess
 import sys
+import time
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Optional
 
 from lib.ui import Colors, colorize, say, ok, warn, error
+from lib.utils.common import docker_compose_cmd
 
 
 # ─── Instance Data Class ──────────────────────────────────────────────────────
@@ -728,6 +730,137 @@ class InstanceManager:
         self.save_instances()
         ok(f"Instance '{name}' removed")
     
+    def clone_instance(self, source_name: str, new_name: str) -> Instance:
+        """Create new_name as a local copy of source_name, without the backup remote.
+
+        data, media and export are copied with reflinks where the filesystem
+        supports them and in full otherwise; they are never hard-linked, so
+        the two instances share no files. The database is streamed from the
+        source's db container into the clone's (pg_dump | psql); if the
+        source database is stopped its directory is copied instead, which
+        is consistent for a shut-down cluster.
+
+        The clone's .env and compose file are written by the installer from
+        the source's settings, like a restore into a new instance: next free
+        HTTP port, direct HTTP access, consume services off, backups to its
+        own remote path and no backup schedule. The clone is started and
+        registered. Raises ValueError for an unknown source or a taken name,
+        CalledProcessError if copying fails (the partial clone is removed).
+        """
+        source = self.get_instance(source_name)
+        if source is None:
+            raise ValueError(f"Instance '{source_name}' not found")
+        if new_name in self.instances:
+            raise ValueError(f"Instance '{new_name}' already exists")
+        clone = Instance(new_name, Path(f"/home/docker/{new_name}-setup"), Path(f"/home/docker/{new_name}"))
+        if clone.stack_dir.exists() or clone.data_root.exists():
+            raise ValueError(f"Paths for '{new_name}' already exist")
+        
+        sys.path.insert(0, "/usr/local/lib/paperless-bulletproof")
+        from lib.installer import common, files
+        from lib.utils.common import load_env
+        from lib.utils.treeclone import clone_tree
+        
+        env = load_env(source.env_file)
+        load_backup_env_config(env, check_port_conflicts=False, skip_consume_folders=True)
+        common.cfg.instance_name = new_name
+        common.cfg.stack_dir = str(clone.stack_dir)
+        common.cfg.data_root = str(clone.data_root)
+        common.cfg.rclone_remote_name = env.get("RCLONE_REMOTE_NAME", "pcloud")
+        common.cfg.rclone_remote_path = f"backups/paperless/{new_name}"
+        common.cfg.postgres_version = env.get("POSTGRES_VERSION", common.cfg.postgres_version)
+        common.cfg.enable_traefik = "no"
+        common.cfg.enable_cloudflared = "no"
+        common.cfg.enable_tailscale = "no"
+        common.cfg.domain = ""
+        port = int(env.get("HTTP_PORT", "8000"))
+        if not is_port_available(port, check_existing_instances=True):
+            port = find_available_port(port + 1, check_existing_instances=True)
+        common.cfg.http_port = str(port)
+        common.cfg.refresh_paths()
+        
+        db_user = env.get("POSTGRES_USER", "paperless")
+        db_name = env.get("POSTGRES_DB", "paperless")
+        source_project, clone_project = f"paperless-{source_name}", f"paperless-{new_name}"
+        stream_db = bool(subprocess.run(
+            docker_compose_cmd(source_project, source.compose_file, "ps", "--status", "running", "-q", "db"),
+            capture_output=True, text=True, check=False
+        ).stdout.strip())
+        
+        started = time.monotonic()
+        try:
+            common.ensure_dir_tree(common.cfg)
+            files.write_env_file()
+            files.write_compose_file()
+            files.copy_helper_scripts()
+            
+            for name in ("data", "media", "export"):
+                if (source.data_root / name).is_dir():
+                    method = clone_tree(source.data_root / name, clone.data_root / name)
+                    ok(f"Copied {name} ({method})")
+            
+            if stream_db:
+                subprocess.run(docker_compose_cmd(clone_project, clone.compose_file, "up", "-d", "db"), check=True)
+                if not self._wait_for_db(clone, db_user, db_name):
+                    raise RuntimeError(f"Database of '{new_name}' did not become ready")
+                say(f"Streaming database from '{source_name}'...")
+                dump = subprocess.Popen(
+                    docker_compose_cmd(source_project, source.compose_file,
+                                       "exec", "-T", "db", "pg_dump", "-U", db_user, db_name),
+                    stdout=subprocess.PIPE
+                )
+                load = subprocess.run(
+                    docker_compose_cmd(clone_project, clone.compose_file, "exec", "-T", "db", "psql", "-q",
+                                       "-v", "ON_ERROR_STOP=1", "-U", db_user, "-d", db_name),
+                    stdin=dump.stdout, stdout=subprocess.DEVNULL, check=False
+                )
+                dump.stdout.close()
+                dump.wait()
+                if dump.returncode != 0 or load.returncode != 0:
+                    raise subprocess.CalledProcessError(
+                        dump.returncode or load.returncode, "pg_dump | psql"
+                    )
+                ok("Database copied")
+            else:
+                method = clone_tree(source.data_root / "db", clone.data_root / "db")
+                ok(f"Copied stopped database directory ({method})")
+            
+            subprocess.run(docker_compose_cmd(clone_project, clone.compose_file, "up", "-d"), check=True)
+        except Exception:
+            warn(f"Clone failed - removing partial instance '{new_name}'")
+            if clone.compose_file.exists():
+                subprocess.run(docker_compose_cmd(clone_project, clone.compose_file, "down", "-v"),
+                               capture_output=True, check=False)
+            shutil.rmtree(clone.stack_dir, ignore_errors=True)
+            shutil.rmtree(clone.data_root, ignore_errors=True)
+            raise
+        
+        instance = self.add_instance(new_name, clone.stack_dir, clone.data_root)
+        instance.labels["cloned_from"] = source_name
+        self.save_instances()
+        ok(f"Cloned '{source_name}' to '{new_name}' in {time.monotonic() - started:.0f}s")
+        return instance
+    
+    @staticmethod
+    def _wait_for_db(instance: Instance, user: str, database: str, timeout: int = 60) -> bool:
+        """Wait until the instance's Postgres accepts TCP connections.
+
+        TCP rather than the socket: the image's first-start initialisation
+        runs a socket-only server that is restarted afterwards.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            ready = subprocess.run(
+                docker_compose_cmd(f"paperless-{instance.name}", instance.compose_file,
+                                   "exec", "-T", "db", "pg_isready", "-h", "127.0.0.1",
+                                   "-U", user, "-d", database),
+                capture_output=True, check=False
+            )
+            if ready.returncode == 0:
+                return True
+            time.sleep(2)
+        return False
+    
     def _cleanup_consume_services(self, instance: 'Instance') -> None:
         """Clean up consume services (Syncthing, Samba, SFTP) for an instance."""
         try:
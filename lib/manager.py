@@ -35,6 +35,9 @@ from lib.instance import (
     is_port_available, is_port_in_use, find_available_port, get_local_ip
 )
 from lib.health import HealthChecker
+from lib.config import ARTIFACT_CACHE_DIR
+from lib.utils.artifactcache import ArtifactCache
+from lib.utils.common import is_snapshot_name
 from lib.backup_ops import (
     BackupManager, run_restore_with_env, get_backup_size, count_snapshots, delete_snapshot
 )
@@ -943,6 +946,9 @@ class PaperlessManager:
         print(box_line(""))
         print(box_line(f"   {colorize('2)', Colors.BOLD)} {colorize('Restore from cloud backup', Colors.CYAN)}"))
         print(box_line("      Restore documents and settings from cloud backup"))
+        print(box_line(""))
+        print(box_line(f"   {colorize('3)', Colors.BOLD)} {colorize('Clone an existing instance', Colors.CYAN)}"))
+        print(box_line("      Local copy for testing, no backup round-trip"))
         print(draw_box_bottom(box_width))
         print()
         print(f"  {colorize('0)', Colors.BOLD)} {colorize('◀ Back', Colors.CYAN)}")
@@ -954,8 +960,49 @@ class PaperlessManager:
             self.create_fresh_instance()
         elif choice == "2":
             self.restore_instance_from_backup()
+        elif choice == "3":
+            self.clone_instance_menu()
         # else back (0 or any other)
     
+    def clone_instance_menu(self) -> None:
+        """Clone an instance locally (copied data and database, new port and paths)."""
+        print_header("Clone Instance")
+        
+        instances = self.instance_manager.list_instances()
+        if not instances:
+            warn("No instances to clone")
+            input("\nPress Enter to continue...")
+            return
+        
+        for idx, inst in enumerate(instances, 1):
+            print(f"  {colorize(str(idx) + ')', Colors.BOLD)} {inst.name}")
+        print()
+        selected = get_input(f"Clone which instance [1-{len(instances)}] or 'cancel'", "cancel")
+        if not selected.isdigit() or not 1 <= int(selected) <= len(instances):
+            return
+        source = instances[int(selected) - 1]
+        
+        existing = self.instance_manager.get_instance_names()
+        suggested = f"{source.name}-test"
+        while suggested in existing or Path(f"/home/docker/{suggested}").exists():
+            suggested = f"{suggested}-2"
+        new_name = get_instance_name_input("Name of the clone", suggested, existing)
+        
+        print()
+        say(f"'{new_name}' gets a copy of {source.name}'s documents and database on its own port.")
+        say("Consume services, HTTPS/tunnel access and backups are not carried over.")
+        if not confirm(f"Clone '{source.name}' to '{new_name}'?", True):
+            return
+        
+        print()
+        try:
+            clone = self.instance_manager.clone_instance(source.name, new_name)
+            print()
+            say(f"Access: {colorize(clone.get_access_url(), Colors.CYAN)}")
+        except Exception as e:
+            error(f"Clone failed: {e}")
+        input("\nPress Enter to continue...")
+    
     def restore_instance_from_backup(self, backup_instance: str = None, snapshot: str = None) -> None:
         """Restore an instance from cloud backup with guided setup.
         
@@ -4987,6 +5034,20 @@ class PaperlessManager:
         try:
             backup_script = instance.stack_dir / "backup.py"
             if backup_script.exists():
+                # Show what would be removed (and the space reclaimed) before deleting
+                preview = subprocess.run(
+                    ["python3", str(backup_script), "cleanup", "--dry-run"],
+                    capture_output=True,
+                    text=True,
+                    check=False,
+                    env={**os.environ, "ENV_FILE": str(instance.env_file)}
+                )
+                if preview.stdout:
+                    print(preview.stdout)
+                if not confirm("Proceed with cleanup?", True):
+                    say("Cancelled")
+                    input("\nPress Enter to continue...")
+                    return
                 result = subprocess.run(
                     ["python3", str(backup_script), "cleanup"],
                     capture_output=True,
@@ -5618,9 +5679,9 @@ consume_config: {network_info.get('consume', {}).get('enabled', False)}
                     )
                     all_snaps = []
                     if result.returncode == 0 and result.stdout.strip():
-                        # Filter out "archive" subfolder - we'll look inside it separately
+                        # Filter out "archive" (we look inside it separately) and "chunks" subfolders
                         raw_snaps = [l.split()[-1] for l in result.stdout.splitlines() if l.strip()]
-                        all_snaps = [s for s in raw_snaps if s != "archive"]
+                        all_snaps = [s for s in raw_snaps if is_snapshot_name(s)]
                     
                     # Also get archive backups from the archive subfolder
                     archive_result = subprocess.run(
@@ -6311,6 +6372,7 @@ consume_config: {network_info.get('consume', {}).get('enabled', False)}
                 options.append((str(len(backup_instances) + 1), colorize("🔄", Colors.YELLOW) + " Run retention cleanup (all instances)"))
                 options.append((str(len(backup_instances) + 2), colorize("🧹", Colors.YELLOW) + " Clean empty folders (auto)"))
                 options.append((str(len(backup_instances) + 3), colorize("🧹", Colors.YELLOW) + " Clean empty folders (select)"))
+                options.append((str(len(backup_instances) + 4), colorize("📦", Colors.YELLOW) + " Restore download cache (hit rate / purge)"))
                 options.append(("0", "Back to main menu"))
                 print_menu(options)
                 
@@ -6326,6 +6388,8 @@ consume_config: {network_info.get('consume', {}).get('enabled', False)}
                     self._clean_empty_backup_folders()
                 elif choice == str(len(backup_instances) + 3):
                     self._clean_empty_backup_folders_selective()
+                elif choice == str(len(backup_instances) + 4):
+                    self._restore_cache_menu()
                 else:
                     warn("Invalid option")
                     
@@ -6499,6 +6563,40 @@ consume_config: {network_info.get('consume', {}).get('enabled', False)}
         print()
         input("\nPress Enter to continue...")
     
+    def _restore_cache_menu(self) -> None:
+        """Show the restore artifact cache's usage and hit rate, and offer to purge it."""
+        print_header("Restore Download Cache")
+        cache = ArtifactCache(Path(ARTIFACT_CACHE_DIR), 0)
+        stats = cache.stats()
+        limits = {
+            inst.name: inst.get_env_value('RESTORE_CACHE_GB', '0')
+            for inst in self.instance_manager.list_instances()
+        }
+        enabled = {name: gb for name, gb in limits.items() if gb not in ("", "0", "0.0")}
+        
+        box_line, box_width = create_box_helper(80)
+        print(draw_box_top(box_width))
+        print(box_line(f" {colorize('Artifact cache', Colors.BOLD)}  {ARTIFACT_CACHE_DIR}"))
+        print(box_line(f""))
+        print(box_line(f" Cached archives: {stats.objects} ({stats.size / 1024 / 1024:.1f} MiB)"))
+        print(box_line(f" Lookups:         {stats.hits} hit(s), {stats.misses} miss(es)"))
+        print(box_line(f" Hit rate:        {stats.hit_rate * 100:.0f}%"))
+        print(box_line(f" Served locally:  {stats.hit_bytes / 1024 / 1024:.1f} MiB"))
+        print(box_line(f" Downloaded:      {stats.miss_bytes / 1024 / 1024:.1f} MiB"))
+        print(box_line(f""))
+        if enabled:
+            for name, gb in enabled.items():
+                print(box_line(f"   • {name}: RESTORE_CACHE_GB={gb}"))
+        else:
+            print(box_line(f" No instance sets RESTORE_CACHE_GB; restores bypass the cache"))
+        print(draw_box_bottom(box_width))
+        print()
+        
+        if stats.objects and confirm("Purge the cache (and reset its counters)?", False):
+            freed = cache.purge()
+            ok(f"Freed {freed / 1024 / 1024:.1f} MiB")
+        input("\nPress Enter to continue...")
+    
     def _run_global_retention_cleanup(self) -> None:
         """Run retention cleanup for all configured instances."""
         print_header("Global Retention Cleanup")
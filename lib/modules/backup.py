@@ -8,18 +8,45 @@ Creates full, incremental, or archive backups including:
 - Configuration files and Docker image versions
 - Manifest with metadata and integrity verification
 """
+import json
 import os
+import shutil
 import sys
 import tempfile
 import subprocess
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from functools import partial
 from pathlib import Path
 from datetime import datetime, timezone
+from typing import BinaryIO
 
 # Add the library path so we can import from lib.*
 sys.path.insert(0, "/usr/local/lib/paperless-bulletproof")
 
-from lib.utils.common import load_env_to_environ, say, ok, warn, die
+from lib.config import POSTGRES_IMAGE_TEMPLATE
+from lib.utils.common import load_env_to_environ, is_snapshot_name, parse_manifest, say, ok, warn, die
+from lib.utils.catalog import ARCHIVE_PREFIX, forget_snapshots, load_catalog, read_catalog, record_snapshot
+from lib.utils.compression import CODECS, Codec, codec_for_file, resolve_codec
+from lib.utils.chunkstore import (
+    CHUNKS_DIR, ChunkWriter, collect_garbage, fetch_index, index_name, index_tree,
+    list_remote_chunks, read_index
+)
+from lib.utils.dbcheck import (
+    DumpSummary, count_rows_sql, parse_row_counts, summarize_directory_dump, summarize_plain_dump,
+    wait_for_postgres
+)
+from lib.utils.file_index import FileEntry, file_index_name, index_tar_stream, write_index
+from lib.utils.tarballs import extract_tar, find_tarballs, tarball_dir_name
+from lib.utils.integrity import (
+    COPY_SIZE, ArchiveDigest, HashingWriter, archive_digests, verify_local, verify_remote
+)
+from lib.utils.snarcache import (
+    MANIFEST_PREFIX as SNAR_PREFIX, copy_state, load_state, manifest_snar_digests, save_state,
+    snar_digests
+)
 
 
 # ─── Configuration ────────────────────────────────────────────────────────────
@@ -58,15 +85,73 @@ RCLONE_ARCHIVE_PATH = os.environ.get(
 )
 POSTGRES_DB = os.environ.get("POSTGRES_DB", "paperless")
 POSTGRES_USER = os.environ.get("POSTGRES_USER", "paperless")
+POSTGRES_VERSION = os.environ.get("POSTGRES_VERSION", "15")
 
 # Backup retention configuration (smart tiered retention)
 # Keep ALL snapshots (incr/full/archive) for RETENTION_DAYS (default 30)
 # After that, only monthly archives are kept for RETENTION_MONTHLY_DAYS (default 180)
 RETENTION_DAYS = int(os.environ.get("RETENTION_DAYS", "30"))
 RETENTION_MONTHLY_DAYS = int(os.environ.get("RETENTION_MONTHLY_DAYS", "180"))
+# Expired snapshots purged concurrently by retention cleanup
+RETENTION_PARALLEL = max(1, int(os.environ.get("RETENTION_PARALLEL", "4")))
+
+# Stream pg_dump through a compressor straight to the remote (rclone rcat)
+# instead of staging postgres.sql in the work dir
+BACKUP_STREAM_DB = os.environ.get("BACKUP_STREAM_DB", "no") == "yes"
+
+# Number of archive phases (DB dump + per-directory tarballs) run concurrently
+BACKUP_WORKERS = max(1, int(os.environ.get("BACKUP_WORKERS", str(min(4, os.cpu_count() or 1)))))
+
+# Compression for tarballs and streamed dumps: gzip, pigz, zstd (-T0) or none
+BACKUP_COMPRESSION = os.environ.get("BACKUP_COMPRESSION", "gzip")
+
+# Content-aware archiving: already-compressed files (PDF, JPEG, ...) in media and
+# export go into a store-only <name>-store.tar instead of through the compressor
+BACKUP_CONTENT_AWARE = os.environ.get("BACKUP_CONTENT_AWARE", "no") == "yes"
+CONTENT_AWARE_DIRS = ("media", "export")
+INCOMPRESSIBLE_EXTENSIONS = (
+    ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".avif",
+    ".zip", ".gz", ".tgz", ".bz2", ".xz", ".zst", ".7z", ".rar",
+    ".docx", ".xlsx", ".pptx", ".odt", ".ods", ".odp", ".epub",
+    ".mp3", ".m4a", ".mp4", ".mov", ".webm",
+)
+
+# Database dump format: "plain" (postgres.sql) or "directory" (pg_dump -Fd -j N into
+# postgres.dump/, restored in parallel with pg_restore -j N)
+BACKUP_DB_FORMAT = os.environ.get("BACKUP_DB_FORMAT", "plain")
+BACKUP_DB_JOBS = max(1, int(os.environ.get("BACKUP_DB_JOBS", str(min(8, os.cpu_count() or 1)))))
+
+# Snapshot format: "tar" (tarball chains) or "chunks" (deduplicated chunk store,
+# every snapshot is a standalone index of content-hashed chunks)
+BACKUP_FORMAT = os.environ.get("BACKUP_FORMAT", "tar")
+
+# DB dump verification: "structural" (TOC / completion marker and row counts, no
+# database server), "replay" (also restore into a scratch container) or "none"
+BACKUP_VERIFY_DB = os.environ.get("BACKUP_VERIFY_DB", "structural")
+
+# Re-read and re-hash every archive before upload instead of trusting the digest
+# taken while it was written (catches corruption on a bad local disk)
+BACKUP_VERIFY_REHASH = os.environ.get("BACKUP_VERIFY_REHASH", "no") == "yes"
+
+# Restore chain limits: an incr that would exceed either becomes a full (0 = no limit)
+BACKUP_MAX_CHAIN_DEPTH = int(os.environ.get("BACKUP_MAX_CHAIN_DEPTH", "0"))
+BACKUP_MAX_CHAIN_GB = float(os.environ.get("BACKUP_MAX_CHAIN_GB", "0"))
+
+# Synthetic fulls: "full" and "archive" runs take an incremental and merge the chain
+# into a new full from the remote copies instead of re-reading the live volumes
+BACKUP_SYNTHETIC_FULL = os.environ.get("BACKUP_SYNTHETIC_FULL", "no") == "yes"
+
+# Archive runs copy the newest full (at most BACKUP_ARCHIVE_COPY_MAX_AGE hours old)
+# server-side instead of tarring and uploading everything again
+BACKUP_ARCHIVE_COPY = os.environ.get("BACKUP_ARCHIVE_COPY", "no") == "yes"
+BACKUP_ARCHIVE_COPY_MAX_AGE = float(os.environ.get("BACKUP_ARCHIVE_COPY_MAX_AGE", "48"))
+
+# Local copy of the last snapshot's .snar files, so incr runs need not fetch them
+INCREMENTAL_STATE_DIR = ".incremental-state"
 
 REMOTE = f"{RCLONE_REMOTE_NAME}:{RCLONE_REMOTE_PATH}"
 ARCHIVE_REMOTE = f"{RCLONE_REMOTE_NAME}:{RCLONE_ARCHIVE_PATH}"
+CHUNK_STORE = f"{REMOTE}/{CHUNKS_DIR}"
 
 
 def _refresh_globals_from_env():
@@ -78,7 +163,11 @@ def _refresh_globals_from_env():
     global ENV_FILE, INSTANCE_NAME, STACK_DIR, DATA_ROOT, DIR_EXPORT, DIR_MEDIA
     global DIR_DATA, DIR_SYNCTHING_CONFIG, COMPOSE_FILE, RCLONE_REMOTE_NAME
     global RCLONE_REMOTE_PATH, RCLONE_ARCHIVE_PATH, POSTGRES_DB, POSTGRES_USER
-    global RETENTION_DAYS, RETENTION_MONTHLY_DAYS, REMOTE, ARCHIVE_REMOTE
+    global RETENTION_DAYS, RETENTION_MONTHLY_DAYS, RETENTION_PARALLEL, REMOTE, ARCHIVE_REMOTE
+    global BACKUP_STREAM_DB, BACKUP_WORKERS, BACKUP_COMPRESSION, BACKUP_CONTENT_AWARE
+    global BACKUP_FORMAT, CHUNK_STORE, BACKUP_DB_FORMAT, BACKUP_DB_JOBS
+    global POSTGRES_VERSION, BACKUP_VERIFY_DB, BACKUP_VERIFY_REHASH, BACKUP_MAX_CHAIN_DEPTH, BACKUP_MAX_CHAIN_GB
+    global BACKUP_SYNTHETIC_FULL, BACKUP_ARCHIVE_COPY, BACKUP_ARCHIVE_COPY_MAX_AGE
     
     INSTANCE_NAME = os.environ.get("INSTANCE_NAME", "paperless")
     STACK_DIR = Path(os.environ.get("STACK_DIR", str(SCRIPT_DIR)))
@@ -93,10 +182,27 @@ def _refresh_globals_from_env():
     RCLONE_ARCHIVE_PATH = os.environ.get("RCLONE_ARCHIVE_PATH", f"{RCLONE_REMOTE_PATH}/archive")
     POSTGRES_DB = os.environ.get("POSTGRES_DB", "paperless")
     POSTGRES_USER = os.environ.get("POSTGRES_USER", "paperless")
+    POSTGRES_VERSION = os.environ.get("POSTGRES_VERSION", "15")
     RETENTION_DAYS = int(os.environ.get("RETENTION_DAYS", "30"))
     RETENTION_MONTHLY_DAYS = int(os.environ.get("RETENTION_MONTHLY_DAYS", "180"))
+    RETENTION_PARALLEL = max(1, int(os.environ.get("RETENTION_PARALLEL", "4")))
+    BACKUP_STREAM_DB = os.environ.get("BACKUP_STREAM_DB", "no") == "yes"
+    BACKUP_WORKERS = max(1, int(os.environ.get("BACKUP_WORKERS", str(min(4, os.cpu_count() or 1)))))
+    BACKUP_COMPRESSION = os.environ.get("BACKUP_COMPRESSION", "gzip")
+    BACKUP_CONTENT_AWARE = os.environ.get("BACKUP_CONTENT_AWARE", "no") == "yes"
+    BACKUP_FORMAT = os.environ.get("BACKUP_FORMAT", "tar")
+    BACKUP_VERIFY_DB = os.environ.get("BACKUP_VERIFY_DB", "structural")
+    BACKUP_VERIFY_REHASH = os.environ.get("BACKUP_VERIFY_REHASH", "no") == "yes"
+    BACKUP_MAX_CHAIN_DEPTH = int(os.environ.get("BACKUP_MAX_CHAIN_DEPTH", "0"))
+    BACKUP_MAX_CHAIN_GB = float(os.environ.get("BACKUP_MAX_CHAIN_GB", "0"))
+    BACKUP_SYNTHETIC_FULL = os.environ.get("BACKUP_SYNTHETIC_FULL", "no") == "yes"
+    BACKUP_ARCHIVE_COPY = os.environ.get("BACKUP_ARCHIVE_COPY", "no") == "yes"
+    BACKUP_ARCHIVE_COPY_MAX_AGE = float(os.environ.get("BACKUP_ARCHIVE_COPY_MAX_AGE", "48"))
+    BACKUP_DB_FORMAT = os.environ.get("BACKUP_DB_FORMAT", "plain")
+    BACKUP_DB_JOBS = max(1, int(os.environ.get("BACKUP_DB_JOBS", str(min(8, os.cpu_count() or 1)))))
     REMOTE = f"{RCLONE_REMOTE_NAME}:{RCLONE_REMOTE_PATH}"
     ARCHIVE_REMOTE = f"{RCLONE_REMOTE_NAME}:{RCLONE_ARCHIVE_PATH}"
+    CHUNK_STORE = f"{REMOTE}/{CHUNKS_DIR}"
 
 
 # ─── Helper Functions ─────────────────────────────────────────────────────────
@@ -110,7 +216,8 @@ def list_snapshots() -> list[str]:
     snapshots = []
     for line in result.stdout.splitlines():
         parts = line.strip().split()
-        if parts:
+        # Skip archive/ and chunks/ - they hold data, they are not snapshots
+        if parts and is_snapshot_name(parts[-1]):
             snapshots.append(parts[-1].rstrip("/"))
     return sorted(snapshots)
 
@@ -119,64 +226,458 @@ def ensure_remote_path(remote: str) -> None:
     subprocess.run(["rclone", "mkdir", remote], check=False)
 
 
+def _compose(*args: str) -> list[str]:
+    return ["docker", "compose", "-f", str(COMPOSE_FILE), *args]
+
+
+def _pg_dump_cmd(*options: str) -> list[str]:
+    return _compose("exec", "-T", "db", "pg_dump", "-U", POSTGRES_USER, *options, POSTGRES_DB)
+
+
 def dump_db(work: Path) -> None:
+    if BACKUP_DB_FORMAT == "directory":
+        dump_db_directory(work)
+        return
     say("Dumping Postgres database…")
     if COMPOSE_FILE.exists():
         try:
             with open(work / "postgres.sql", "wb") as fh:
-                subprocess.run(
-                    [
-                        "docker",
-                        "compose",
-                        "-f",
-                        str(COMPOSE_FILE),
-                        "exec",
-                        "-T",
-                        "db",
-                        "pg_dump",
-                        "-U",
-                        POSTGRES_USER,
-                        POSTGRES_DB,
-                    ],
-                    check=True,
-                    stdout=fh,
-                )
+                subprocess.run(_pg_dump_cmd(), check=True, stdout=fh)
         except Exception:
             warn("pg_dump failed (continuing without DB dump)")
     else:
         warn("Compose file not found; skipping DB dump")
 
 
-def tar_dir(src: Path, name: str, work: Path, mode: str) -> None:
+def dump_db_directory(work: Path) -> None:
+    """Dump with `pg_dump -Fd -j N` inside the db container into work/postgres.dump/."""
+    say(f"Dumping Postgres database (directory format, {BACKUP_DB_JOBS} jobs)…")
+    if not COMPOSE_FILE.exists():
+        warn("Compose file not found; skipping DB dump")
+        return
+    container_dir = "/tmp/paperless-backup.dump"
+    try:
+        subprocess.run(_compose("exec", "-T", "db", "rm", "-rf", container_dir), check=False)
+        subprocess.run(
+            _pg_dump_cmd("-Fd", "-j", str(BACKUP_DB_JOBS), "-f", container_dir), check=True
+        )
+        subprocess.run(_compose("cp", f"db:{container_dir}", str(work / "postgres.dump")), check=True)
+    except Exception:
+        warn("pg_dump failed (continuing without DB dump)")
+        shutil.rmtree(work / "postgres.dump", ignore_errors=True)
+    finally:
+        subprocess.run(_compose("exec", "-T", "db", "rm", "-rf", container_dir), check=False)
+
+
+def streamed_dump_path(dest: str, codec: Codec) -> str:
+    return f"{dest}/postgres.sql{codec.extension}"
+
+
+@dataclass
+class DbStream:
+    """A running `pg_dump | <compressor> | rclone rcat` pipeline."""
+    procs: list[subprocess.Popen]
+    threads: list[threading.Thread] = field(default_factory=list)  # Relay and summarizer
+    summary: DumpSummary | None = None
+    relay_error: str | None = None
+
+
+def _relay_dump(stream: DbStream, source: BinaryIO, sinks: list[BinaryIO]) -> None:
+    """Copy pg_dump's output to the compressor and the summarizer."""
+    try:
+        while data := source.read(COPY_SIZE):
+            for sink in sinks:
+                sink.write(data)
+    except OSError as e:
+        stream.relay_error = str(e)
+    finally:
+        # Closing the read end makes pg_dump fail too if the relay stopped early
+        source.close()
+        for sink in sinks:
+            try:
+                sink.close()
+            except OSError:
+                pass
+
+
+def _summarize_stream(stream: DbStream, source: BinaryIO) -> None:
+    with source:
+        stream.summary = summarize_plain_dump(source)
+
+
+def start_db_stream(dest: str, codec: Codec) -> DbStream | None:
+    """Start `pg_dump | <compressor> | rclone rcat` writing the dump to dest.
+
+    Nothing is staged on local disk. pg_dump's output is teed into
+    summarize_plain_dump() on its way to the compressor, so the structural
+    check never reads the dump back from the remote. The pipeline runs in the
+    background so the tar phases can proceed; collect the result with
+    finish_db_stream().
+    """
+    if not COMPOSE_FILE.exists():
+        warn("Compose file not found; skipping DB dump")
+        return None
+    say("Streaming Postgres dump to remote…")
+    dump = subprocess.Popen(_pg_dump_cmd(), stdout=subprocess.PIPE)
+    compress = subprocess.Popen(list(codec.compress_cmd), stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    upload = subprocess.Popen(["rclone", "rcat", streamed_dump_path(dest, codec)], stdin=compress.stdout)
+    compress.stdout.close()  # rclone owns the read end now
+    read_fd, write_fd = os.pipe()
+    tee = os.fdopen(write_fd, "wb")
+    stream = DbStream([dump, compress, upload])
+    stream.threads = [
+        threading.Thread(target=_summarize_stream, args=(stream, os.fdopen(read_fd, "rb"))),
+        threading.Thread(target=_relay_dump, args=(stream, dump.stdout, [compress.stdin, tee])),
+    ]
+    for thread in stream.threads:
+        thread.start()
+    return stream
+
+
+def finish_db_stream(stream: DbStream | None, dest: str, codec: Codec) -> DumpSummary | None:
+    """Wait for a streamed dump and return its summary (None if it failed).
+
+    The partial remote object is removed on failure.
+    """
+    if stream is None:
+        return None
+    for thread in stream.threads:
+        thread.join()
+    codes = [proc.wait() for proc in stream.procs]
+    if any(codes) or stream.relay_error or stream.summary is None:
+        warn("Streamed pg_dump failed (continuing without DB dump)")
+        subprocess.run(
+            ["rclone", "deletefile", streamed_dump_path(dest, codec)],
+            check=False, capture_output=True
+        )
+        return None
+    ok("Database dump streamed to remote")
+    return stream.summary
+
+
+def prepare_incremental_state(work: Path, catalog: dict[str, dict] | None) -> str:
+    """Put the parent's .snar files into work and return the parent's name ("" = none).
+
+    The local cache is used when its checksums hold and it belongs to the
+    latest snapshot in the catalog (or the catalog cannot be read, so a slow
+    remote does not stop the run). Otherwise the files are fetched from the
+    latest snapshot and checked against the digests in its manifest.
+    """
+    cache = STACK_DIR / INCREMENTAL_STATE_DIR
+    local = load_state(cache)
+    latest, expected = None, {}
+    if catalog is not None:
+        latest = max((name for name in catalog if not name.startswith(ARCHIVE_PREFIX)), default="")
+        if latest:
+            expected = manifest_snar_digests(catalog[latest].get("manifest", {}))
+
+    if local and (latest is None or (local.snapshot == latest and expected in ({}, local.digests))):
+        copy_state(cache, local, work)
+        say(f"Using cached incremental state of {local.snapshot}")
+        return local.snapshot
+
+    if latest is None:
+        snaps = list_snapshots()
+        latest = snaps[-1] if snaps else ""
+    if not latest:
+        return ""
+    say(f"Fetching incremental state of {latest}…")
+    subprocess.run(
+        ["rclone", "copy", f"{REMOTE}/{latest}", str(work), "--include", "*.snar"],
+        check=False,
+    )
+    if expected and snar_digests(work) != expected:
+        warn(f"Incremental state of {latest} does not match its manifest; taking a full backup")
+        for snar in work.glob("*.snar"):
+            snar.unlink()
+        return ""
+    return latest
+
+
+def chain_position(catalog: dict[str, dict] | None, name: str) -> tuple[int, int]:
+    """Return (incrementals, archive bytes) of the restore chain ending at name.
+
+    Uses the chain_depth/chain_bytes recorded in manifests and walks parent
+    links through the catalog for snapshots taken before they were recorded.
+    """
+    depth = total = 0
+    seen = set()
+    while catalog and name in catalog and name not in seen:
+        manifest = catalog[name].get("manifest", {})
+        if "chain_depth" in manifest and "chain_bytes" in manifest:
+            return depth + int(manifest["chain_depth"]), total + int(manifest["chain_bytes"])
+        total += sum(digest.size for digest in archive_digests(manifest).values())
+        if manifest.get("mode") != "incr":
+            break
+        depth += 1
+        seen.add(name)
+        name = manifest.get("parent", "")
+    return depth, total
+
+
+def chain_limit_reason(parent_depth: int, parent_bytes: int) -> str:
+    """Why an incremental on top of this chain must become a full ("" if it need not)."""
+    if BACKUP_MAX_CHAIN_DEPTH and parent_depth + 1 > BACKUP_MAX_CHAIN_DEPTH:
+        return f"chain_depth {parent_depth + 1} > {BACKUP_MAX_CHAIN_DEPTH}"
+    if BACKUP_MAX_CHAIN_GB and parent_bytes >= BACKUP_MAX_CHAIN_GB * 1024 ** 3:
+        return f"chain_bytes {parent_bytes} >= {BACKUP_MAX_CHAIN_GB:g} GiB"
+    return ""
+
+
+def tar_dir(src: Path, name: str, work: Path, mode: str, codec: Codec) -> dict | None:
+    """Archive src into work; returns {"archives": {file: ArchiveDigest}, ...}."""
     if not src.exists():
         warn(f"Skip {name}: directory not found at {src}")
-        return
+        return None
     say(f"Archiving {name}…")
+    if BACKUP_CONTENT_AWARE and name in CONTENT_AWARE_DIRS and codec.program:
+        return tar_dir_split(src, name, work, mode, codec)
     snarf = work / f"{name}.snar"
     if mode == "full" and snarf.exists():
         snarf.unlink()
-    subprocess.run(
-        [
-            "tar",
-            "--listed-incremental",
-            str(snarf),
-            "-czf",
-            str(work / f"{name}.tar.gz"),
-            "-C",
-            str(src.parent),
-            name,
-        ],
-        check=True,
+    _, _, filename, digest = _write_tar(
+        ["--listed-incremental", str(snarf)], ["-C", str(src.parent), name],
+        work, name, codec,
     )
+    return {"archives": {filename: digest}}
+
+
+def _write_tar(
+    options: list[str], operands: list[str], work: Path, base: str, codec: Codec
+) -> tuple[int, float, str, ArchiveDigest]:
+    """Write work/<base>.tar<ext> and its per-file index <base>.index.gz.
+
+    tar writes an uncompressed stream which is indexed (path, size, mtime,
+    sha256) on its way to the compressor, and the compressed output is
+    hashed on its way to disk, so neither the index nor the integrity record
+    costs a second read of the data. Returns (tar stream bytes, CPU seconds,
+    archive filename, digest); CPU time is read with os.wait4() so it covers
+    tar and the compressor even when other phases run concurrently.
+    """
+    archive = work / f"{base}.tar{codec.extension}"
+    tar = subprocess.Popen(["tar", *options, "-cf", "-", *operands], stdout=subprocess.PIPE)
+    compressor = copier = None
+    with open(archive, "wb") as out:
+        hashed = HashingWriter(out)
+        sink = hashed
+        if codec.program:
+            compressor = subprocess.Popen(
+                codec.compress_cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE
+            )
+            copier = threading.Thread(target=hashed.copy_from, args=(compressor.stdout,))
+            copier.start()
+            sink = compressor.stdin
+        try:
+            entries, members, total = index_tar_stream(tar.stdout, sink)
+        finally:
+            tar.stdout.close()
+            if compressor:
+                compressor.stdin.close()
+                copier.join()
+                compressor.stdout.close()
+
+    cpu = 0.0
+    failed = []
+    for proc in filter(None, (tar, compressor)):
+        _, status, usage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+        cpu += usage.ru_utime + usage.ru_stime
+        if proc.returncode != 0:
+            failed.append(proc)
+    if failed:
+        raise subprocess.CalledProcessError(failed[0].returncode, failed[0].args)
+    if entries is not None:
+        write_index(entries, work / file_index_name(base))
+    return total, cpu, archive.name, ArchiveDigest(hashed.hexdigest(), hashed.size, members)
+
+
+def tar_dir_split(src: Path, name: str, work: Path, mode: str, codec: Codec) -> dict:
+    """Archive compressible files with codec and incompressible ones store-only.
+
+    Both tarballs keep their own .snar. Files excluded from one archive are
+    still recorded in its directory listings, so extracting either archive
+    never deletes files that live in the other one.
+    """
+    snarf = work / f"{name}.snar"
+    store_snarf = work / f"{name}-store.snar"
+    if mode == "full":
+        for state in (snarf, store_snarf):
+            if state.exists():
+                state.unlink()
+
+    # Each tar excludes the other one's files by exact name, so a directory
+    # whose name happens to end in an incompressible extension is still walked
+    compressible = work / f"{name}-compressible.list"
+    incompressible = work / f"{name}-incompressible.list"
+    with open(compressible, "w") as packed_fh, open(incompressible, "w") as store_fh:
+        for root, dirs, files in os.walk(src):
+            rel = Path(root).relative_to(src.parent)
+            # os.walk lists symlinks to directories with dirs; tar archives them as links
+            links = [d for d in dirs if os.path.islink(os.path.join(root, d))]
+            for fname in (*files, *links):
+                if "\n" in fname:
+                    continue
+                fh = store_fh if fname.lower().endswith(INCOMPRESSIBLE_EXTENSIONS) else packed_fh
+                fh.write(f"{rel / fname}\n")
+
+    operands = ["-C", str(src.parent), name]
+    try:
+        packed_bytes, packed_cpu, packed_file, packed_digest = _write_tar(
+            ["--listed-incremental", str(snarf), "--anchored", "--no-wildcards",
+             "-X", str(incompressible)],
+            operands, work, name, codec,
+        )
+        store_bytes, store_cpu, store_file, store_digest = _write_tar(
+            ["--listed-incremental", str(store_snarf), "--anchored", "--no-wildcards",
+             "-X", str(compressible)],
+            operands, work, f"{name}-store", CODECS["none"],
+        )
+    finally:
+        compressible.unlink()
+        incompressible.unlink()
+
+    # What the store-only bytes would have cost at the compressor's measured rate
+    cpu_saved = max(0.0, packed_cpu / packed_bytes * store_bytes - store_cpu) if packed_bytes else 0.0
+    say(
+        f"  {name}: {store_bytes / 1048576:.1f} MiB stored without compression "
+        f"(compressed part {packed_cpu:.1f}s CPU, ~{cpu_saved:.1f}s CPU saved)"
+    )
+    return {
+        "archives": {packed_file: packed_digest, store_file: store_digest},
+        "store_bytes": store_bytes, "cpu": packed_cpu + store_cpu, "cpu_saved": cpu_saved,
+    }
+
+
+def chunk_dir(src: Path, name: str, work: Path, writer: ChunkWriter, previous: str) -> dict | None:
+    """Index src into the chunk store, writing <name>.chunks.gz to work.
+
+    previous is the last snapshot; files unchanged since its index are not
+    read or hashed again.
+    """
+    if not src.exists():
+        warn(f"Skip {name}: directory not found at {src}")
+        return None
+    say(f"Indexing {name} into the chunk store…")
+    old = fetch_index(f"{REMOTE}/{previous}/{index_name(name)}") if previous else {}
+    stats = index_tree(src, work / index_name(name), writer, old)
+    write_index(
+        (FileEntry(e["path"], e["size"], e["mtime_ns"] // 1_000_000_000, e["sha256"])
+         for e in read_index(work / index_name(name)) if e["type"] == "file"),
+        work / file_index_name(name),
+    )
+    say(f"  {name}: {stats['files']} files, {stats['reused']} unchanged since last snapshot")
+    return stats
+
+
+@dataclass
+class ArchiveStage:
+    """Outcome of run_archive_phases()."""
+    timings: dict[str, float] = field(default_factory=dict)
+    streamed_dump: str | None = None  # Remote path when BACKUP_STREAM_DB is on
+    streamed_summary: DumpSummary | None = None  # Summarized while the dump was streamed
+    archives: dict[str, ArchiveDigest] = field(default_factory=dict)  # Inline integrity records
+    content_aware: dict[str, dict] = field(default_factory=dict)  # tar_dir_split() stats
+    chunks: dict[str, dict] = field(default_factory=dict)  # chunk_dir() stats
+    chunk_writer: ChunkWriter | None = None
+
+
+def _timed(func) -> tuple[float, object]:
+    start = time.monotonic()
+    result = func()
+    return time.monotonic() - start, result
+
 
+def run_archive_phases(
+    work: Path, tar_mode: str, dest: str, codec: Codec, previous: str = ""
+) -> ArchiveStage:
+    """Run the DB dump and the per-directory archive phases concurrently.
 
-def verify_archives(work: Path) -> bool:
-    """Run `tar -t` on produced archives to ensure integrity."""
+    Up to BACKUP_WORKERS phases run at once (1 keeps the old serial order).
+    With BACKUP_FORMAT=chunks the directories are indexed into the chunk
+    store instead of tarred; previous names the snapshot whose indexes let
+    unchanged files skip hashing.
+    """
+    stage = ArchiveStage()
+    phases = {}
+    streaming = BACKUP_STREAM_DB and BACKUP_DB_FORMAT != "directory"
+    if BACKUP_STREAM_DB and not streaming:
+        warn("Directory-format dumps cannot be streamed; staging postgres.dump locally")
+    if streaming:
+        db_stream = start_db_stream(dest, codec)
+        phases["database"] = partial(finish_db_stream, db_stream, dest, codec)
+    else:
+        phases["database"] = partial(dump_db, work)
+
+    if BACKUP_FORMAT == "chunks":
+        staging = Path(tempfile.mkdtemp(prefix="paperless-chunk-staging."))
+        stage.chunk_writer = ChunkWriter(CHUNK_STORE, staging, list_remote_chunks(CHUNK_STORE))
+        archive = partial(chunk_dir, work=work, writer=stage.chunk_writer, previous=previous)
+    else:
+        archive = partial(tar_dir, work=work, mode=tar_mode, codec=codec)
+    phases["media"] = partial(archive, DIR_MEDIA, "media")
+    phases["data"] = partial(archive, DIR_DATA, "data")
+    phases["export"] = partial(archive, DIR_EXPORT, "export")
+    # Backup Syncthing config if it exists (for consume folder sync)
+    if DIR_SYNCTHING_CONFIG.exists():
+        phases["syncthing-config"] = partial(archive, DIR_SYNCTHING_CONFIG, "syncthing-config")
+
+    say(f"Running {len(phases)} archive phases with {BACKUP_WORKERS} worker(s)…")
+    start = time.monotonic()
+    try:
+        # Leaving the with-block waits for every phase, so a failing tar is only
+        # raised (by result()) after its siblings have finished cleanly
+        with ThreadPoolExecutor(max_workers=BACKUP_WORKERS) as pool:
+            futures = {name: pool.submit(_timed, func) for name, func in phases.items()}
+        if stage.chunk_writer and all(f.exception() is None for f in futures.values()):
+            stage.chunk_writer.flush()
+    finally:
+        if stage.chunk_writer:
+            shutil.rmtree(stage.chunk_writer.staging, ignore_errors=True)
+    wall = time.monotonic() - start
+
+    for name, future in futures.items():
+        elapsed, result = future.result()
+        stage.timings[name] = elapsed
+        if name == "database":
+            if streaming and result:
+                stage.streamed_dump = streamed_dump_path(dest, codec)
+                stage.streamed_summary = result
+        elif result and BACKUP_FORMAT == "chunks":
+            stage.chunks[name] = result
+        elif result:
+            stage.archives.update(result.pop("archives"))
+            if result:
+                stage.content_aware[name] = result
+
+    serial = sum(stage.timings.values())
+    for name, elapsed in stage.timings.items():
+        say(f"  {name:<18} {elapsed:7.1f}s")
+    ok(f"Archive phases done in {wall:.1f}s (serial {serial:.1f}s, saved {max(0.0, serial - wall):.1f}s)")
+    if stage.chunk_writer:
+        writer = stage.chunk_writer
+        ok(f"Uploaded {writer.uploaded_chunks} new chunk(s), {writer.uploaded_bytes / 1048576:.1f} MiB")
+    stage.timings["total"] = wall
+    return stage
+
+
+def verify_archives(work: Path, digests: dict[str, ArchiveDigest]) -> bool:
+    """Check produced archives against the integrity records taken while writing them.
+
+    An archive whose tar stream was fully parsed and hashed inline only needs
+    its size confirmed (or its sha256, with BACKUP_VERIFY_REHASH); anything
+    without such a record falls back to `tar -t`.
+    """
+    trusted = {f: d for f, d in digests.items() if d.entries}
     all_ok = True
-    for tarball in work.glob("*.tar.gz"):
+    for filename in verify_local(work, trusted, rehash=BACKUP_VERIFY_REHASH):
+        warn(f"Archive verification failed: {filename}")
+        all_ok = False
+    for tarball in work.glob("*.tar*"):
+        if tarball.name in trusted:
+            continue
         if (
             subprocess.run(
-                ["tar", "-tzf", str(tarball)],
+                ["tar", *codec_for_file(tarball).tar_flags(), "-tf", str(tarball)],
                 stdout=subprocess.DEVNULL,
                 stderr=subprocess.DEVNULL,
                 check=False,
@@ -188,6 +689,38 @@ def verify_archives(work: Path) -> bool:
     return all_ok
 
 
+def verify_uploaded(dest: str, digests: dict[str, ArchiveDigest]) -> bool:
+    """Compare the uploaded archives in dest with their integrity records."""
+    bad = verify_remote(dest, digests)
+    for filename in bad:
+        warn(f"Uploaded archive does not match its manifest: {filename}")
+    return not bad
+
+
+def verify_main(snapshot: str = "") -> bool:
+    """Re-verify a snapshot on the remote (default: the latest) from its manifest alone."""
+    if not snapshot:
+        snaps = list_snapshots()
+        if not snaps:
+            die("No snapshots found")
+        snapshot = snaps[-1]
+    remote_dir = f"{REMOTE}/{snapshot}"
+    result = subprocess.run(
+        ["rclone", "cat", f"{remote_dir}/manifest.yaml"], capture_output=True, text=True, check=False
+    )
+    if result.returncode != 0:
+        die(f"Could not read manifest of {snapshot}")
+    digests = archive_digests(parse_manifest(result.stdout))
+    if not digests:
+        warn(f"{snapshot} predates inline integrity records; nothing to compare")
+        return False
+    say(f"Verifying {len(digests)} archive(s) of {snapshot}…")
+    if verify_uploaded(remote_dir, digests):
+        ok(f"{snapshot}: all archives match their manifest")
+        return True
+    return False
+
+
 def capture_docker_versions(work: Path) -> None:
     """Capture Docker image versions for restoration."""
     if not COMPOSE_FILE.exists():
@@ -230,65 +763,210 @@ def capture_docker_versions(work: Path) -> None:
         warn(f"Failed to capture Docker versions: {e}")
 
 
-def test_db_restore(work: Path) -> bool:
-    """Attempt to restore the dumped DB into a temporary container."""
+def postgres_image() -> str:
+    """Postgres image matching the instance's major version, for scratch containers.
+
+    The running db container is asked first; POSTGRES_VERSION from .env is
+    the fallback when it is not reachable.
+    """
+    version = POSTGRES_VERSION
+    if COMPOSE_FILE.exists():
+        result = subprocess.run(
+            _compose("exec", "-T", "db", "psql", "-U", POSTGRES_USER, "-d", POSTGRES_DB,
+                     "-Atc", "SHOW server_version_num"),
+            capture_output=True, text=True, check=False
+        )
+        if result.returncode == 0 and result.stdout.strip().isdigit():
+            version = str(int(result.stdout.strip()) // 10000)
+    return POSTGRES_IMAGE_TEMPLATE.format(version=version)
+
+
+def summarize_dump(work: Path, image: str) -> DumpSummary | None:
+    """Structural check of a local dump: TOC/data files or completion marker, plus row counts."""
     dump = work / "postgres.sql"
-    if not dump.exists():
-        return True
+    dump_dir = work / "postgres.dump"
+    if dump_dir.exists():
+        listing = subprocess.run(
+            ["docker", "run", "--rm", "-v", f"{dump_dir}:/dump:ro", image, "pg_restore", "--list", "/dump"],
+            capture_output=True, text=True, check=False
+        )
+        if listing.returncode != 0:
+            return DumpSummary(problems=[f"pg_restore --list failed: {listing.stderr.strip()}"])
+        return summarize_directory_dump(dump_dir, listing.stdout)
+    if dump.exists():
+        with open(dump, "rb") as fh:
+            return summarize_plain_dump(fh)
+    return None
+
+
+def replay_db_dump(work: Path, remote_dump: str | None, image: str, summary: DumpSummary) -> bool:
+    """Restore the dump into a scratch container and compare its row counts."""
     name = f"paperless-restore-test-{int(time.time())}"
-    say("Verifying database dump…")
+    dump = work / "postgres.sql"
+    dump_dir = work / "postgres.dump"
+    say(f"Replaying database dump into {image}…")
     try:
         subprocess.run(
-            ["docker", "run", "-d", "--rm", "--name", name, "-e", "POSTGRES_PASSWORD=test", "postgres"],
+            ["docker", "run", "-d", "--rm", "--name", name, "-e", "POSTGRES_PASSWORD=test", image],
             check=True,
             stdout=subprocess.DEVNULL,
             stderr=subprocess.DEVNULL,
         )
-        time.sleep(5)
-        with open(dump, "rb") as fh:
+        if not wait_for_postgres(name):
+            raise RuntimeError("scratch postgres did not become ready")
+        psql = ["docker", "exec", "-i", name, "psql", "-U", "postgres"]
+        if dump_dir.exists():
+            subprocess.run(["docker", "cp", str(dump_dir), f"{name}:/tmp/dump"], check=True)
             subprocess.run(
-                ["docker", "exec", "-i", name, "psql", "-U", "postgres"],
-                stdin=fh,
+                ["docker", "exec", name, "pg_restore", "-U", "postgres", "-d", "postgres",
+                 "--no-owner", "--no-privileges", "-j", str(BACKUP_DB_JOBS), "/tmp/dump"],
                 check=True,
                 stdout=subprocess.DEVNULL,
                 stderr=subprocess.DEVNULL,
             )
-        subprocess.run(["docker", "rm", "-f", name], check=False, stdout=subprocess.DEVNULL)
+        elif dump.exists():
+            with open(dump, "rb") as fh:
+                subprocess.run(
+                    psql,
+                    stdin=fh,
+                    check=True,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+        else:
+            cat = subprocess.Popen(["rclone", "cat", remote_dump], stdout=subprocess.PIPE)
+            decompress = subprocess.Popen(
+                list(codec_for_file(Path(remote_dump)).decompress_cmd),
+                stdin=cat.stdout, stdout=subprocess.PIPE
+            )
+            cat.stdout.close()
+            subprocess.run(
+                psql,
+                stdin=decompress.stdout,
+                check=True,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+            )
+            decompress.stdout.close()
+            if cat.wait() != 0 or decompress.wait() != 0:
+                raise RuntimeError("could not read streamed dump back")
+        if summary.tables:
+            result = subprocess.run(
+                [*psql, "-At", "-F", "\t", "-c", count_rows_sql(list(summary.tables))],
+                capture_output=True, text=True, check=True
+            )
+            restored = parse_row_counts(result.stdout)
+            mismatched = sorted(t for t, rows in summary.tables.items() if restored.get(t) != rows)
+            if mismatched:
+                raise RuntimeError(f"row counts differ after replay: {', '.join(mismatched[:5])}")
+        ok("DB replay matched the dump's row counts")
         return True
-    except Exception:
-        warn("DB restore test failed")
-        subprocess.run(["docker", "rm", "-f", name], check=False, stdout=subprocess.DEVNULL)
+    except Exception as e:
+        warn(f"DB restore test failed: {e}")
         return False
+    finally:
+        subprocess.run(["docker", "rm", "-f", name], check=False, stdout=subprocess.DEVNULL,
+                       stderr=subprocess.DEVNULL)
 
 
-def main() -> Path:
-    mode = sys.argv[1] if len(sys.argv) > 1 else None
+def verify_db_dump(
+    work: Path, remote_dump: str | None = None, streamed: DumpSummary | None = None
+) -> tuple[bool, DumpSummary | None]:
+    """Verify the DB dump according to BACKUP_VERIFY_DB.
+
+    "structural" (default) reads the dump once without a database server;
+    "replay" additionally restores it into a scratch container running the
+    instance's Postgres major version; "none" skips both. remote_dump points
+    at a streamed postgres.sql[.gz|.zst] that only exists on the remote, and
+    streamed is the summary taken while it was uploaded; only a replay reads
+    it back.
+    """
+    if BACKUP_VERIFY_DB == "none":
+        return True, None
+    if not (work / "postgres.sql").exists() and not (work / "postgres.dump").exists() and not remote_dump:
+        return True, None
+    say("Verifying database dump…")
+    image = postgres_image()
+    summary = streamed if remote_dump else summarize_dump(work, image)
+    for problem in summary.problems:
+        warn(f"DB dump: {problem}")
+    if not summary.complete:
+        warn("DB dump verification failed")
+        return False, summary
+    ok(f"DB dump structure OK: {len(summary.tables)} tables, {summary.rows} rows")
+    if BACKUP_VERIFY_DB == "replay":
+        return replay_db_dump(work, remote_dump, image, summary), summary
+    return True, summary
+
+
+def main(mode: str | None = None) -> Path:
+    mode = mode or (sys.argv[1] if len(sys.argv) > 1 else None)
     if mode not in {"full", "incr", "archive"}:
         die("Usage: backup.py [full|incr|archive]")
+    if mode == "archive" and BACKUP_ARCHIVE_COPY:
+        work = archive_by_copy()
+        if work is not None:
+            return work
+    if mode in {"full", "archive"} and BACKUP_SYNTHETIC_FULL and BACKUP_FORMAT == "tar":
+        return synthesize_full(mode)
     ensure_remote_path(ARCHIVE_REMOTE if mode == "archive" else REMOTE)
-    snaps = list_snapshots()
-    parent = snaps[-1] if snaps else ""
-    if mode == "incr" and not snaps:
+    work = Path(tempfile.mkdtemp(prefix="paperless-backup."))
+    chunked = BACKUP_FORMAT == "chunks"
+    catalog = None
+    if mode == "incr" and not chunked:
+        # Rebuilt from a listing when catalog.json is missing, so the chain caps still apply
+        catalog = read_catalog(REMOTE) or load_catalog(REMOTE)
+        parent = prepare_incremental_state(work, catalog)
+    else:
+        snaps = list_snapshots()
+        parent = snaps[-1] if snaps else ""
+    if mode == "incr" and not parent:
         mode = "full"
+
+    # Bound restore time: cap how many incrementals (and bytes) a restore must replay
+    chain_depth, chain_bytes = chain_position(catalog, parent) if mode == "incr" else (0, 0)
+    promoted = chain_limit_reason(chain_depth, chain_bytes) if mode == "incr" else ""
+    if promoted:
+        say(f"Restore chain limit reached ({promoted}); taking a full backup instead")
+        mode = "full"
+        chain_depth = chain_bytes = 0
     
     snap = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
-    work = Path(tempfile.mkdtemp(prefix="paperless-backup."))
-    if mode == "incr" and parent:
-        subprocess.run(
-            ["rclone", "copy", f"{REMOTE}/{parent}", str(work), "--include", "*.snar"],
-            check=False,
-        )
+    dest_root = ARCHIVE_REMOTE if mode == "archive" else REMOTE
+    dest = f"{dest_root}/{snap}"
     say(f"Creating {mode} snapshot {snap}")
 
-    dump_db(work)
+    codec = resolve_codec(BACKUP_COMPRESSION)
     tar_mode = "full" if mode in {"full", "archive"} else "incr"
-    tar_dir(DIR_MEDIA, "media", work, tar_mode)
-    tar_dir(DIR_DATA, "data", work, tar_mode)
-    tar_dir(DIR_EXPORT, "export", work, tar_mode)
-    
-    # Backup Syncthing config if it exists (for consume folder sync)
-    if DIR_SYNCTHING_CONFIG.exists():
-        tar_dir(DIR_SYNCTHING_CONFIG, "syncthing-config", work, tar_mode)
+    try:
+        stage = run_archive_phases(work, tar_mode, dest, codec, previous=parent)
+        passed, snars = prepare_snapshot(work, stage, mode, parent, codec, chunked, chain_depth, chain_bytes, promoted)
+    except BaseException:
+        # A streamed dump is already at dest; without a manifest it must not pass for a snapshot
+        discard_incomplete(dest)
+        raise
+    finish_snapshot(work, dest, snap, mode, passed, stage.archives, snars)
+    return work
+
+
+def discard_incomplete(dest: str) -> None:
+    """Remove whatever a failed backup already wrote to dest on the remote."""
+    result = subprocess.run(["rclone", "purge", dest], check=False, capture_output=True, text=True)
+    # Exit code 3 is rclone's "directory not found": nothing was written yet
+    if result.returncode == 0:
+        warn(f"Removed incomplete snapshot {dest}")
+    elif result.returncode != 3:
+        warn(f"Could not remove incomplete snapshot {dest}: {result.stderr.strip()}")
+
+
+def prepare_snapshot(
+    work: Path, stage: ArchiveStage, mode: str, parent: str, codec: Codec, chunked: bool,
+    chain_depth: int, chain_bytes: int, promoted: str,
+) -> tuple[bool, dict[str, str]]:
+    """Add config and manifest.yaml to work and verify it.
+
+    Returns whether every check passed, and the digests of the .snar files.
+    """
 
     if ENV_FILE.exists():
         (work / ".env").write_text(ENV_FILE.read_text())
@@ -301,12 +979,51 @@ def main() -> Path:
     # Capture Docker image versions for restoration
     capture_docker_versions(work)
 
-    manifest_lines = [f"mode: {mode}", f"created: {datetime.now(timezone.utc).isoformat()}"]
-    if mode == "incr" and parent:
+    manifest_lines = [
+        f"mode: {mode}",
+        f"created: {datetime.now(timezone.utc).isoformat()}",
+        f"compression: {codec.name}",
+        f"format: {'chunks' if chunked else 'tar'}",
+    ]
+    # Chunk snapshots are self-contained indexes, so they never need a parent
+    if mode == "incr" and parent and not chunked:
         manifest_lines.append(f"parent: {parent}")
+    if stage.chunk_writer:
+        manifest_lines.append(f"chunks_uploaded: {stage.chunk_writer.uploaded_chunks}")
+        manifest_lines.append(f"chunk_bytes_uploaded: {stage.chunk_writer.uploaded_bytes}")
+    manifest_lines.append(
+        "timings: " + ",".join(f"{name}={elapsed:.1f}" for name, elapsed in stage.timings.items())
+    )
+    if stage.content_aware:
+        store_bytes = sum(stats["store_bytes"] for stats in stage.content_aware.values())
+        cpu_saved = sum(stats["cpu_saved"] for stats in stage.content_aware.values())
+        manifest_lines.append(f"store_only_bytes: {store_bytes}")
+        manifest_lines.append(f"cpu_saved_seconds: {cpu_saved:.1f}")
+        ok(f"Content-aware archiving: {store_bytes / 1048576:.1f} MiB skipped compression, ~{cpu_saved:.1f}s CPU saved")
+    for filename, digest in sorted(stage.archives.items()):
+        manifest_lines.append(digest.manifest_line(filename))
+    if not chunked:
+        manifest_lines.append(f"chain_depth: {chain_depth + 1 if mode == 'incr' else 0}")
+        manifest_lines.append(
+            f"chain_bytes: {chain_bytes + sum(d.size for d in stage.archives.values())}"
+        )
+    if promoted:
+        manifest_lines.append(f"promoted: {promoted}")
+    snars = snar_digests(work)
+    manifest_lines.extend(f"{SNAR_PREFIX}{filename}: {digest}" for filename, digest in snars.items())
+    db_ok, db_summary = verify_db_dump(work, stage.streamed_dump, stage.streamed_summary)
+    if db_summary is not None:
+        manifest_lines.extend(db_summary.manifest_lines())
     (work / "manifest.yaml").write_text("\n".join(manifest_lines) + "\n")
 
-    passed = verify_archives(work) and test_db_restore(work)
+    return verify_archives(work, stage.archives) and db_ok, snars
+
+
+def finish_snapshot(
+    work: Path, dest: str, snap: str, mode: str, passed: bool,
+    archives: dict[str, ArchiveDigest], snars: dict[str, str]
+) -> None:
+    """Mark, upload and verify a prepared snapshot, then record it and run retention."""
     status = "status.ok" if passed else "status.fail"
     (work / status).write_text(datetime.now(timezone.utc).isoformat() + "\n")
     if passed:
@@ -314,45 +1031,237 @@ def main() -> Path:
     else:
         warn("Integrity checks failed")
 
-    dest_root = ARCHIVE_REMOTE if mode == "archive" else REMOTE
-    dest = f"{dest_root}/{snap}"
     say(f"Uploading to {dest}")
-    subprocess.run(
-        [
-            "rclone",
-            "copy",
-            str(work),
-            dest,
-            "--checksum",
-            "--transfers",
-            "4",
-            "--checkers",
-            "8",
-            "--fast-list",
-        ],
-        check=True,
+    try:
+        subprocess.run(
+            [
+                "rclone",
+                "copy",
+                str(work),
+                dest,
+                "--checksum",
+                "--transfers",
+                "4",
+                "--checkers",
+                "8",
+                "--fast-list",
+            ],
+            check=True,
+        )
+    except BaseException:
+        discard_incomplete(dest)
+        raise
+    if not verify_uploaded(dest, archives):
+        if passed:
+            subprocess.run(
+                ["rclone", "moveto", f"{dest}/status.ok", f"{dest}/status.fail"], check=False
+            )
+        die(f"Upload of {snap} is corrupt; keeping older snapshots untouched")
+    ok("Uploaded archives match their manifest")
+    record_in_catalog(
+        snap, mode, parse_manifest((work / "manifest.yaml").read_text()),
+        (work / "docker-images.txt").exists(),
     )
+    if mode in {"full", "incr"} and snars:
+        save_state(STACK_DIR / INCREMENTAL_STATE_DIR, snap, work, snars)
 
     # Run retention cleanup after backup
     if RETENTION_DAYS > 0:
         run_retention_cleanup()
 
     ok("Backup completed")
+
+
+def restore_chain(catalog: dict[str, dict], tip: str) -> list[str]:
+    """Snapshots to apply, oldest first, to reproduce tip (its full, then incrementals)."""
+    chain = []
+    name = tip
+    while name in catalog and name not in chain:
+        chain.append(name)
+        manifest = catalog[name].get("manifest", {})
+        if manifest.get("mode") != "incr" or not manifest.get("parent"):
+            break
+        name = manifest["parent"]
+    chain.reverse()
+    return chain
+
+
+def synthesize_full(mode: str) -> Path:
+    """Build a full (or archive) snapshot by merging the latest chain instead of re-reading live data.
+
+    A cheap incremental is taken first so the result is current. The chain
+    ending at it is then downloaded and extracted in order into a local
+    scratch tree, which is re-tarred as a full. The tip's .snar files are
+    reused as the new snapshot's incremental state, since they still describe
+    the live directories, and its DB dump and config files are copied as-is.
+    """
+    shutil.rmtree(main("incr"), ignore_errors=True)
+    catalog = read_catalog(REMOTE) or load_catalog(REMOTE)
+    standard = sorted(name for name in catalog if not name.startswith(ARCHIVE_PREFIX))
+    tip = standard[-1] if standard else ""
+    tip_manifest = catalog.get(tip, {}).get("manifest", {})
+    if tip_manifest.get("format", "tar") != "tar":
+        die(f"{tip} is not a tar-format snapshot; cannot synthesize a full from it")
+    chain = restore_chain(catalog, tip)
+    if not chain or catalog[chain[0]].get("manifest", {}).get("mode") == "incr":
+        die(f"The restore chain of {tip} is incomplete; run a regular {mode} instead")
+    if mode == "full" and tip_manifest.get("mode") != "incr":
+        ok(f"{tip} is already a full snapshot; nothing to synthesize")
+        return Path(tempfile.mkdtemp(prefix="paperless-backup."))
+
+    snap = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+    dest = f"{ARCHIVE_REMOTE if mode == 'archive' else REMOTE}/{snap}"
+    ensure_remote_path(ARCHIVE_REMOTE if mode == "archive" else REMOTE)
+    say(f"Synthesizing {mode} snapshot {snap} from " + " -> ".join(chain))
+    work = Path(tempfile.mkdtemp(prefix="paperless-backup."))
+    scratch = Path(tempfile.mkdtemp(prefix="paperless-synthetic."))
+    start = time.monotonic()
+    try:
+        for name in chain:
+            download = Path(tempfile.mkdtemp(prefix="paperless-synthetic-dl.", dir=scratch.parent))
+            try:
+                subprocess.run(
+                    ["rclone", "copy", f"{REMOTE}/{name}", str(download), "--include", "*.tar*",
+                     "--transfers", "4"],
+                    check=True,
+                )
+                hint = catalog[name].get("manifest", {}).get("compression", "")
+                bases = sorted({tarball_dir_name(t) for t in download.glob("*.tar*")})
+                for base in bases:
+                    for tarball in find_tarballs(download, base):
+                        extract_tar(tarball, scratch, hint)
+            finally:
+                shutil.rmtree(download, ignore_errors=True)
+        merged = time.monotonic() - start
+
+        # Everything but the tarballs comes from the tip unchanged
+        subprocess.run(
+            ["rclone", "copy", f"{REMOTE}/{tip}", str(work),
+             "--include", "*.snar", "--include", ".env", "--include", "compose.snapshot.yml",
+             "--include", "docker-images.txt", "--include", "postgres.sql*",
+             "--include", "postgres.dump/**"],
+            check=True,
+        )
+        tip_state = work / "tip-state"
+        tip_state.mkdir()
+        for snar in work.glob("*.snar"):
+            snar.rename(tip_state / snar.name)
+        expected = manifest_snar_digests(tip_manifest)
+        if expected and snar_digests(tip_state) != expected:
+            die(f"Incremental state of {tip} does not match its manifest; run a regular full instead")
+
+        codec = resolve_codec(BACKUP_COMPRESSION)
+        archives: dict[str, ArchiveDigest] = {}
+        dirs = sorted(path.name for path in scratch.iterdir() if path.is_dir())
+        with ThreadPoolExecutor(max_workers=BACKUP_WORKERS) as pool:
+            results = list(pool.map(
+                lambda name: tar_dir(scratch / name, name, work, "full", codec), dirs
+            ))
+        for result in results:
+            if result:
+                archives.update(result["archives"])
+        # The scratch tree's .snar files describe scratch inodes; keep the tip's
+        for snar in work.glob("*.snar"):
+            snar.unlink()
+        for snar in tip_state.iterdir():
+            snar.rename(work / snar.name)
+        tip_state.rmdir()
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    snars = snar_digests(work)
+    manifest_lines = [
+        f"mode: {mode}",
+        f"created: {datetime.now(timezone.utc).isoformat()}",
+        f"compression: {codec.name}",
+        "format: tar",
+        f"synthetic_from: {tip}",
+        f"timings: merge={merged:.1f},total={time.monotonic() - start:.1f}",
+    ]
+    manifest_lines.extend(digest.manifest_line(f) for f, digest in sorted(archives.items()))
+    manifest_lines.append("chain_depth: 0")
+    manifest_lines.append(f"chain_bytes: {sum(d.size for d in archives.values())}")
+    manifest_lines.extend(f"{SNAR_PREFIX}{filename}: {digest}" for filename, digest in snars.items())
+    # The DB dump is the tip's, so are its structural check results
+    manifest_lines.extend(
+        f"{key}: {tip_manifest[key]}" for key in ("db_tables", "db_rows", "db_checksum")
+        if key in tip_manifest
+    )
+    (work / "manifest.yaml").write_text("\n".join(manifest_lines) + "\n")
+
+    passed = verify_archives(work, archives)
+    finish_snapshot(work, dest, snap, mode, passed, archives, snars)
     return work
 
 
-def list_archive_snapshots() -> list[str]:
-    """List available archive snapshots on remote."""
+def archive_by_copy() -> Path | None:
+    """Create the archive snapshot as a server-side copy of a recent full.
+
+    The newest full that passed its checks (has status.ok) and is no older
+    than BACKUP_ARCHIVE_COPY_MAX_AGE hours is copied remote-to-remote (no
+    upload bandwidth) and gets its own manifest saying where it came from.
+    Returns None when there is no such full or the copy fails, so the
+    caller takes a regular archive instead.
+    """
+    catalog = read_catalog(REMOTE) or load_catalog(REMOTE)
+    now = datetime.now()
+    fulls = sorted(
+        name for name, entry in catalog.items()
+        if not name.startswith(ARCHIVE_PREFIX)
+        and entry.get("manifest", {}).get("mode") == "full"
+        and (snap_date := parse_snapshot_date(name)) is not None
+        and (now - snap_date).total_seconds() <= BACKUP_ARCHIVE_COPY_MAX_AGE * 3600
+    )
+    source = next((name for name in reversed(fulls) if passed_checks(f"{REMOTE}/{name}")), None)
+    if source is None:
+        say(f"No verified full snapshot from the last {BACKUP_ARCHIVE_COPY_MAX_AGE}h to copy; archiving normally")
+        return None
+    source_entry = catalog[source]
+    snap = now.strftime("%Y-%m-%d_%H-%M-%S")
+    dest = f"{ARCHIVE_REMOTE}/{snap}"
+    say(f"Creating archive snapshot {snap} as a server-side copy of {source}")
+    ensure_remote_path(ARCHIVE_REMOTE)
     result = subprocess.run(
-        ["rclone", "lsd", ARCHIVE_REMOTE],
+        ["rclone", "copy", f"{REMOTE}/{source}", dest, "--exclude", "/manifest.yaml",
+         "--transfers", "8", "--checkers", "8"],
+        check=False,
+    )
+    manifest = dict(source_entry.get("manifest", {}))
+    digests = archive_digests(manifest)
+    if result.returncode != 0 or not verify_uploaded(dest, digests):
+        warn("Server-side copy failed; archiving normally")
+        subprocess.run(["rclone", "purge", dest], check=False, capture_output=True)
+        return None
+
+    manifest.update(mode="archive", created=datetime.now(timezone.utc).isoformat(), copied_from=source)
+    manifest.pop("parent", None)
+    work = Path(tempfile.mkdtemp(prefix="paperless-backup."))
+    (work / "manifest.yaml").write_text("".join(f"{key}: {value}\n" for key, value in manifest.items()))
+    subprocess.run(["rclone", "copyto", str(work / "manifest.yaml"), f"{dest}/manifest.yaml"], check=True)
+    record_in_catalog(snap, "archive", manifest, source_entry.get("has_docker_versions", False))
+    if RETENTION_DAYS > 0:
+        run_retention_cleanup()
+    ok("Archive snapshot created without uploading data")
+    return work
+
+
+def passed_checks(snapshot: str) -> bool:
+    """Whether the snapshot at this remote path was marked status.ok."""
+    result = subprocess.run(
+        ["rclone", "lsf", snapshot, "--files-only", "--include", "/status.ok"],
         capture_output=True, text=True, check=False
     )
-    snapshots = []
-    for line in result.stdout.splitlines():
-        parts = line.strip().split()
-        if parts:
-            snapshots.append(parts[-1].rstrip("/"))
-    return sorted(snapshots)
+    return result.returncode == 0 and "status.ok" in result.stdout.split()
+
+
+def record_in_catalog(snap: str, mode: str, manifest: dict[str, str], has_docker_versions: bool) -> None:
+    """Add the uploaded snapshot to the instance catalog (best effort; readers self-heal)."""
+    if mode == "archive":
+        if ARCHIVE_REMOTE != f"{REMOTE}/archive":
+            return  # The catalog only covers snapshots below the instance remote
+        snap = f"{ARCHIVE_PREFIX}{snap}"
+    if not record_snapshot(REMOTE, snap, manifest, has_docker_versions):
+        warn("Could not update the snapshot catalog; it will be rebuilt on next listing")
 
 
 def parse_snapshot_date(snap_name: str) -> datetime | None:
@@ -369,119 +1278,161 @@ def is_first_of_month(snap_name: str) -> bool:
     return dt is not None and dt.day == 1
 
 
-def run_retention_cleanup() -> None:
+@dataclass
+class Expiry:
+    """One snapshot the retention planner decided to delete."""
+    root: str  # REMOTE or ARCHIVE_REMOTE
+    name: str
+    size: int
+    reason: str
+
+    @property
+    def path(self) -> str:
+        return f"{self.root}/{self.name}"
+
+
+def snapshot_sizes(root: str) -> dict[str, tuple[int, bool]] | None:
+    """(bytes, has manifest.yaml) per snapshot directory under root (and root/archive), from one listing.
+
+    Keys are snapshot names, archive ones prefixed "archive/". The chunk
+    store is excluded from the listing. Returns None if root could not be listed.
     """
-    Smart tiered retention cleanup:
+    result = subprocess.run(
+        ["rclone", "lsjson", root, "-R", "--files-only", "--no-modtime", "--no-mimetype",
+         "--fast-list", "--exclude", f"/{CHUNKS_DIR}/**"],
+        capture_output=True, text=True, check=False
+    )
+    if result.returncode == 3:
+        return {}
+    if result.returncode != 0:
+        return None
+    sizes: dict[str, tuple[int, bool]] = {}
+    for item in json.loads(result.stdout or "[]"):
+        parts = item["Path"].split("/")
+        if len(parts) >= 2 and is_snapshot_name(parts[0]):
+            key, rest = parts[0], parts[1:]
+        elif len(parts) >= 3 and parts[0] == "archive" and is_snapshot_name(parts[1]):
+            key, rest = f"{ARCHIVE_PREFIX}{parts[1]}", parts[2:]
+        else:
+            continue
+        size, complete = sizes.get(key, (0, False))
+        sizes[key] = (size + max(0, item.get("Size", 0)), complete or rest == ["manifest.yaml"])
+    return sizes
+
+
+def plan_retention(now: datetime | None = None) -> list[Expiry] | None:
+    """Work out which snapshots retention would delete (None if listing failed).
+
     - Keep ALL snapshots (standard + archive) for RETENTION_DAYS
     - After RETENTION_DAYS, delete non-archive snapshots
     - Keep monthly archives (1st of month) for RETENTION_MONTHLY_DAYS
     - Delete archives older than RETENTION_MONTHLY_DAYS
+    - Snapshots without a manifest (left by a failed upload) never count as
+      monthly archives; they go once older than RETENTION_DAYS
     """
-    say("Running retention cleanup...")
-    now = datetime.now()
-    
-    # 1. Clean up standard backups older than RETENTION_DAYS
-    # Note: Standard backups are in REMOTE, archive backups are in ARCHIVE_REMOTE (subfolder)
-    # We need to be careful not to delete the "archive" folder itself from standard path
+    now = now or datetime.now()
+    sizes = snapshot_sizes(REMOTE)
+    if sizes is None:
+        return None
+    standard = {name: usage for name, usage in sizes.items() if not name.startswith(ARCHIVE_PREFIX)}
+    if ARCHIVE_REMOTE == f"{REMOTE}/archive":
+        archives = {
+            name[len(ARCHIVE_PREFIX):]: usage
+            for name, usage in sizes.items() if name.startswith(ARCHIVE_PREFIX)
+        }
+    else:
+        archive_sizes = snapshot_sizes(ARCHIVE_REMOTE)
+        if archive_sizes is None:
+            return None
+        archives = {n: s for n, s in archive_sizes.items() if not n.startswith(ARCHIVE_PREFIX)}
+
+    plan = []
     if RETENTION_DAYS > 0:
-        say(f"  Cleaning standard backups older than {RETENTION_DAYS} days...")
-        # Get list of snapshots and delete old ones individually to avoid deleting archive folder
-        result = subprocess.run(
-            ["rclone", "lsd", REMOTE],
-            capture_output=True, text=True, check=False
-        )
-        if result.returncode == 0:
-            for line in result.stdout.splitlines():
-                parts = line.strip().split()
-                if not parts:
-                    continue
-                snap_name = parts[-1].rstrip("/")
-                
-                # Skip the archive folder itself (it's a special folder, not a snapshot)
-                if snap_name == "archive":
-                    continue
-                
-                snap_date = parse_snapshot_date(snap_name)
-                if snap_date is None:
-                    continue
-                
-                age_days = (datetime.now() - snap_date).days
-                if age_days > RETENTION_DAYS:
-                    say(f"  Removing old snapshot {snap_name} ({age_days}d old)...")
-                    subprocess.run(
-                        ["rclone", "purge", f"{REMOTE}/{snap_name}"],
-                        check=False, capture_output=True
-                    )
-        subprocess.run(["rclone", "rmdirs", REMOTE, "--leave-root"], check=False)
-    
-    # 2. Clean up archive backups with tiered retention
+        for name, (size, complete) in sorted(standard.items()):
+            snap_date = parse_snapshot_date(name)
+            age_days = (now - snap_date).days if snap_date else 0
+            if age_days > RETENTION_DAYS:
+                reason = f"{age_days}d old" if complete else f"incomplete (no manifest), {age_days}d old"
+                plan.append(Expiry(REMOTE, name, size, reason))
     if RETENTION_MONTHLY_DAYS > 0:
-        # Check if archive path exists before attempting cleanup
-        archive_check = subprocess.run(
-            ["rclone", "lsd", ARCHIVE_REMOTE],
-            capture_output=True, text=True, check=False
-        )
-        if archive_check.returncode != 0 or not archive_check.stdout.strip():
-            say("  No archive directory yet, skipping archive cleanup")
-        else:
-            archives = list_archive_snapshots()
-            deleted_count = 0
-            kept_monthly = []
-            
-            for snap in archives:
-                snap_date = parse_snapshot_date(snap)
-                if snap_date is None:
-                    continue
-                
-                age_days = (now - snap_date).days
-                
-                # Within RETENTION_DAYS: keep all archives
-                if age_days <= RETENTION_DAYS:
-                    continue
-                
-                # Between RETENTION_DAYS and RETENTION_MONTHLY_DAYS: keep only 1st-of-month
-                if age_days <= RETENTION_MONTHLY_DAYS:
-                    if is_first_of_month(snap):
-                        kept_monthly.append(snap)
-                        continue
-                    else:
-                        # Delete non-monthly archives older than retention period
-                        say(f"  Removing archive {snap} (not monthly, {age_days}d old)...")
-                        subprocess.run(
-                            ["rclone", "purge", f"{ARCHIVE_REMOTE}/{snap}"],
-                            check=False, capture_output=True
-                        )
-                        deleted_count += 1
-                else:
-                    # Older than RETENTION_MONTHLY_DAYS: delete even monthly archives
-                    say(f"  Removing archive {snap} ({age_days}d old, exceeds {RETENTION_MONTHLY_DAYS}d)...")
-                    subprocess.run(
-                        ["rclone", "purge", f"{ARCHIVE_REMOTE}/{snap}"],
-                        check=False, capture_output=True
-                    )
-                    deleted_count += 1
-            
-            if deleted_count > 0:
-                ok(f"  Removed {deleted_count} old archive(s)")
-            if kept_monthly:
-                say(f"  Kept {len(kept_monthly)} monthly archive(s)")
-    
+        for name, (size, complete) in sorted(archives.items()):
+            snap_date = parse_snapshot_date(name)
+            if snap_date is None:
+                continue
+            age_days = (now - snap_date).days
+            # Within RETENTION_DAYS: keep all archives; then only 1st-of-month
+            if age_days <= RETENTION_DAYS:
+                continue
+            if not complete:
+                plan.append(Expiry(ARCHIVE_REMOTE, name, size, f"archive, incomplete (no manifest), {age_days}d old"))
+            elif age_days <= RETENTION_MONTHLY_DAYS:
+                if not is_first_of_month(name):
+                    plan.append(Expiry(ARCHIVE_REMOTE, name, size, f"archive, not monthly, {age_days}d old"))
+            else:
+                plan.append(Expiry(
+                    ARCHIVE_REMOTE, name, size,
+                    f"archive, {age_days}d old, exceeds {RETENTION_MONTHLY_DAYS}d"
+                ))
+    return plan
+
+
+def _purge(path: str) -> bool:
+    return subprocess.run(["rclone", "purge", path], check=False, capture_output=True).returncode == 0
+
+
+def run_retention_cleanup(dry_run: bool = False) -> None:
+    """Smart tiered retention cleanup (see plan_retention()).
+
+    Expired snapshots are purged RETENTION_PARALLEL at a time. With dry_run
+    the plan and the bytes it would reclaim are only printed.
+    """
+    say("Running retention cleanup..." + (" (dry run)" if dry_run else ""))
+    plan = plan_retention()
+    if plan is None:
+        warn("Could not list snapshots; skipping retention cleanup")
+        return
+    reclaim = sum(item.size for item in plan)
+    for item in plan:
+        say(f"  {'Would remove' if dry_run else 'Removing'} {item.name} ({item.reason}, {item.size / 1048576:.1f} MiB)")
+    if dry_run:
+        ok(f"{len(plan)} snapshot(s) would be removed, reclaiming {reclaim / 1048576:.1f} MiB")
+        return
+
+    if plan:
+        with ThreadPoolExecutor(max_workers=RETENTION_PARALLEL) as pool:
+            results = list(pool.map(_purge, [item.path for item in plan]))
+        removed = [item for item, done in zip(plan, results) if done]
+        for item, done in zip(plan, results):
+            if not done:
+                warn(f"  Could not remove {item.path}")
+        ok(f"  Removed {len(removed)} snapshot(s), {sum(i.size for i in removed) / 1048576:.1f} MiB reclaimed")
+        # Catalog keys: plain names, archives as archive/<name> when they live below REMOTE
+        forget_snapshots(REMOTE, [
+            item.name if item.root == REMOTE else f"{ARCHIVE_PREFIX}{item.name}" for item in removed
+        ])
+    else:
+        say("  Nothing to remove")
+    # Empty snapshot directories hold no files, so the listing above never sees them
+    subprocess.run(["rclone", "rmdirs", REMOTE, "--leave-root"], check=False)
     subprocess.run(["rclone", "rmdirs", ARCHIVE_REMOTE, "--leave-root"], check=False)
+
+    # Drop chunks that no remaining snapshot index references
+    collect_garbage(CHUNK_STORE, [REMOTE, ARCHIVE_REMOTE])
     ok("Retention cleanup complete")
 
 
-def cleanup_main() -> None:
+def cleanup_main(dry_run: bool = False) -> None:
     """Standalone cleanup entry point (can be called via cron or manually)."""
-    run_retention_cleanup()
+    run_retention_cleanup(dry_run=dry_run)
 
 
 if __name__ == "__main__":
-    import shutil
-
     # Support cleanup mode
     if len(sys.argv) > 1 and sys.argv[1] == "cleanup":
-        cleanup_main()
+        cleanup_main(dry_run="--dry-run" in sys.argv[2:])
         sys.exit(0)
+    if len(sys.argv) > 1 and sys.argv[1] == "verify":
+        sys.exit(0 if verify_main(sys.argv[2] if len(sys.argv) > 2 else "") else 1)
 
     work = None
     try:
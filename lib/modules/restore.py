@@ -5,18 +5,38 @@ Restore Paperless-ngx data from an rclone snapshot.
 Handles fetching snapshots, building incremental restore chains,
 restoring database and data directories, and running health checks.
 """
+import json
 import os
 import sys
 import shutil
 import tempfile
 import subprocess
 import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from itertools import islice
 from pathlib import Path
 
 # Add the library path so we can import from lib.*
 sys.path.insert(0, "/usr/local/lib/paperless-bulletproof")
 
-from lib.utils.common import load_env, load_env_to_environ, say, ok, warn, die
+from lib.utils.common import (
+    load_env, load_env_to_environ, parse_manifest, say, ok, warn, die
+)
+from lib.config import ARTIFACT_CACHE_DIR
+from lib.utils.artifactcache import ArtifactCache
+from lib.utils.catalog import load_catalog, read_catalog
+from lib.utils.compression import codec_for_file
+from lib.utils.file_index import INDEX_SUFFIX as FILE_INDEX_SUFFIX
+from lib.utils.integrity import archive_digests, verify_remote
+from lib.utils.tarballs import (
+    extract_tar, find_tarballs, is_tarball, select_tarballs, stream_tar, tarball_dir_name
+)
+from lib.utils.chunkstore import CHUNKS_DIR, index_name, restore_index
+from lib.utils.chunkstore import INDEX_SUFFIX as CHUNK_INDEX_SUFFIX, read_index as chunk_read_index
+from lib.utils.progress import Progress, format_bytes, format_eta, relay, run_rclone
+from lib.utils.selective import export_document_rows, filter_chunk_index, locate_files, path_matches
 from lib.utils.selftest import run_stack_tests
 
 
@@ -50,9 +70,53 @@ RCLONE_REMOTE_NAME = os.environ.get("RCLONE_REMOTE_NAME", "pcloud")
 RCLONE_REMOTE_PATH = os.environ.get("RCLONE_REMOTE_PATH", f"backups/paperless/{INSTANCE_NAME}")
 POSTGRES_DB = os.environ.get("POSTGRES_DB", "paperless")
 POSTGRES_USER = os.environ.get("POSTGRES_USER", "paperless")
+# Parallel jobs for pg_restore of directory-format (postgres.dump/) dumps
+RESTORE_DB_JOBS = max(1, int(os.environ.get("RESTORE_DB_JOBS", str(min(8, os.cpu_count() or 1)))))
+# Load the dump with synchronous_commit off, more maintenance memory and (plain dumps) one transaction
+RESTORE_DB_FAST = os.environ.get("RESTORE_DB_FAST", "no") == "yes"
+RESTORE_DB_MAINTENANCE_MEM = os.environ.get("RESTORE_DB_MAINTENANCE_MEM", "512MB")
+# Extract tarballs straight from `rclone cat` instead of downloading each snapshot first
+RESTORE_STREAM = os.environ.get("RESTORE_STREAM", "no") == "yes"
+# Chain members downloaded ahead of the one being extracted (0 = strictly serial)
+RESTORE_PREFETCH = max(0, int(os.environ.get("RESTORE_PREFETCH", "1")))
+# data, media and export are extracted concurrently by this many workers
+RESTORE_WORKERS = max(1, int(os.environ.get("RESTORE_WORKERS", "3")))
+# Restore next to the running stack and swap in at the end (seconds of downtime;
+# the replaced tree and database are kept for `restore.py --rollback`)
+RESTORE_STAGED = os.environ.get("RESTORE_STAGED", "no") == "yes"
+# Start the stack once DB, data and export are back and stream media in the background
+RESTORE_MEDIA_BACKGROUND = os.environ.get("RESTORE_MEDIA_BACKGROUND", "no") == "yes"
+# Check the chain (presence, checksums) and disk space before stopping anything
+RESTORE_PREFLIGHT = os.environ.get("RESTORE_PREFLIGHT", "yes") == "yes"
+# Local cache of downloaded archives shared by all instances (GiB, 0 = off)
+RESTORE_CACHE_GB = max(0.0, float(os.environ.get("RESTORE_CACHE_GB", "0")))
+RESTORE_CACHE_DIR = Path(os.environ.get("RESTORE_CACHE_DIR", ARTIFACT_CACHE_DIR))
 
 REMOTE = f"{RCLONE_REMOTE_NAME}:{RCLONE_REMOTE_PATH}"
 
+DATA_DIRS = ("data", "media", "export")
+# Background media restores report here (JSON) and log to MEDIA_LOG, both in STACK_DIR
+MEDIA_PROGRESS = "restore-media.progress"
+# Foreground restores report here (JSON, polled by other tools), also in STACK_DIR
+RESTORE_PROGRESS = "restore.progress"
+MEDIA_LOG = "restore-media.log"
+
+# Staged restores load the dump into <db>_restore; the replaced database is kept as <db>_pre_restore
+STAGING_DB_SUFFIX = "_restore"
+PREVIOUS_DB_SUFFIX = "_pre_restore"
+SWAPPED_LIST = ".swapped"
+# Pre-flight space checks ask for this much more than the estimate
+SPACE_MARGIN = 1.1
+
+# Progress of the restore run by main(); None otherwise
+_progress: Progress | None = None
+
+
+def _track(nbytes: int) -> None:
+    """Count nbytes towards the running restore's progress."""
+    if _progress is not None:
+        _progress.advance(nbytes)
+
 
 def _compose_cmd(*args: str) -> list[str]:
     """Build docker compose command for this instance."""
@@ -60,175 +124,498 @@ def _compose_cmd(*args: str) -> list[str]:
 
 
 def fetch_snapshots() -> list[tuple[str, str, str]]:
-    """Fetch snapshots from main path and archive subfolder."""
-    snaps: list[tuple[str, str, str]] = []
-    
-    def get_snapshots_from_path(path: str, prefix: str = "") -> list[tuple[str, str, str]]:
-        """Helper to fetch snapshots from a specific path."""
-        res = subprocess.run(
-            ["rclone", "lsd", path], capture_output=True, text=True, check=False
-        )
-        results = []
-        for line in res.stdout.splitlines():
-            parts = line.strip().split()
-            if not parts:
-                continue
-            name = parts[-1].rstrip("/")
-            
-            # Skip the archive folder itself (we query it separately)
-            if name == "archive" and not prefix:
-                continue
-            
-            mode = parent = "?"
-            cat = subprocess.run(
-                ["rclone", "cat", f"{path}/{name}/manifest.yaml"],
-                capture_output=True,
-                text=True,
-                check=False,
-            )
-            if cat.returncode == 0:
-                for mline in cat.stdout.splitlines():
-                    if ":" in mline:
-                        k, v = mline.split(":", 1)
-                        if k.strip() == "mode":
-                            mode = v.strip()
-                        elif k.strip() == "parent":
-                            parent = v.strip()
-            
-            # Prefix archive snapshots so we know where they came from
-            display_name = f"{prefix}{name}" if prefix else name
-            results.append((display_name, mode, parent))
-        return results
-    
-    # Get main snapshots
-    snaps.extend(get_snapshots_from_path(REMOTE))
-    
-    # Also get archive snapshots
-    snaps.extend(get_snapshots_from_path(f"{REMOTE}/archive", prefix="archive/"))
-    
+    """Fetch snapshots from main path and archive subfolder (via the remote catalog)."""
+    snaps = []
+    for name, entry in load_catalog(REMOTE).items():
+        manifest = entry.get("manifest", {})
+        snaps.append((name, manifest.get("mode", "?"), manifest.get("parent", "?")))
     return sorted(snaps, key=lambda x: x[0])
 
 
-def extract_tar(tar_path: Path, dest: Path) -> None:
-    subprocess.run(
-        ["tar", "--listed-incremental=/dev/null", "-xpf", str(tar_path), "-C", str(dest)],
-        check=True,
+@dataclass
+class RemoteTarballs:
+    """Tarballs of a snapshot left on the remote, to be streamed during extraction."""
+    remote_dir: str = ""
+    filenames: list[str] = field(default_factory=list)
+
+
+def artifact_cache() -> ArtifactCache | None:
+    """The local archive cache, or None when RESTORE_CACHE_GB is 0."""
+    if RESTORE_CACHE_GB <= 0:
+        return None
+    return ArtifactCache(RESTORE_CACHE_DIR, int(RESTORE_CACHE_GB * 1024 ** 3))
+
+
+def fetch_cached(cache: ArtifactCache, remote_dir: str, tmp: Path, filenames: list[str]) -> list[str]:
+    """Take a snapshot's tarballs from the artifact cache; return those still to be fetched.
+
+    Tarballs are matched by the checksums in the already downloaded
+    manifest. Without RESTORE_STREAM misses are downloaded through the
+    cache; with it only hits are used and misses are left to be streamed.
+    Tarballs without a recorded checksum (older snapshots) are not cached.
+    """
+    manifest = tmp / "manifest.yaml"
+    digests = archive_digests(parse_manifest(manifest.read_text())) if manifest.exists() else {}
+    remaining, hits = [], 0
+    for filename in filenames:
+        digest = digests.get(filename)
+        remote_path = f"{remote_dir}/{filename}"
+        if digest is None:
+            remaining.append(filename)
+        elif RESTORE_STREAM:
+            if cache.lookup(remote_path, digest.sha256, tmp / filename):
+                hits += 1
+            else:
+                remaining.append(filename)
+        else:
+            hits += cache.fetch(remote_path, digest.sha256, tmp / filename)
+            _track(digest.size)
+    if hits:
+        say(f"{remote_dir.rsplit('/', 1)[-1]}: {hits} of {len(filenames)} archive(s) from the local cache")
+    return remaining
+
+
+def fetch_snapshot(snap: str, tmp: Path, skip: tuple[str, ...] = ()) -> RemoteTarballs:
+    """Download a snapshot into tmp, leaving out the archives of the dirs in skip.
+
+    With RESTORE_STREAM only the small files (manifest, config, DB dump,
+    chunk indexes) are downloaded; the tarballs stay on the remote and are
+    extracted from a stream, so the restore needs no staging space for them.
+    With RESTORE_CACHE_GB set, tarballs are read through the artifact cache.
+    """
+    remote_dir = f"{REMOTE}/{snap}"
+    excludes = []
+    for name in skip:
+        for pattern in (f"{name}.tar*", f"{name}-store.tar", index_name(name)):
+            excludes += ["--exclude", f"/{pattern}"]
+    cache = artifact_cache()
+    if not RESTORE_STREAM and cache is None:
+        run_rclone(["sync", remote_dir, str(tmp), *excludes], _track)
+        return RemoteTarballs()
+    listing = subprocess.run(
+        ["rclone", "lsf", remote_dir, "--files-only"], capture_output=True, text=True, check=True
     )
+    run_rclone(
+        ["copy", remote_dir, str(tmp), *excludes, "--exclude", "*.tar", "--exclude", "*.tar.*",
+         "--exclude", "*.snar", "--exclude", f"*{FILE_INDEX_SUFFIX}"],
+        _track
+    )
+    tarballs = [
+        f for f in listing.stdout.splitlines()
+        if is_tarball(f) and tarball_dir_name(Path(f)) not in skip
+    ]
+    if cache is not None:
+        tarballs = fetch_cached(cache, remote_dir, tmp, tarballs)
+    if RESTORE_STREAM:
+        return RemoteTarballs(remote_dir, tarballs)
+    for filename in tarballs:
+        run_rclone(["copyto", f"{remote_dir}/{filename}", str(tmp / filename)], _track)
+    return RemoteTarballs()
+
 
+def prefetch_snapshots(chain: list[str], skip: tuple[str, ...] = ()):
+    """Yield (snapshot, tmp dir, remote tarballs) in chain order.
 
-def restore_db(dump: Path) -> None:
+    Up to RESTORE_PREFETCH later chain members are downloaded in the
+    background while the caller extracts the current one. The caller
+    removes each yielded tmp dir; dirs fetched but never yielded (restore
+    aborted) are removed here.
+    """
+    queue = iter(chain)
+    pending: deque[tuple[str, Path, Future]] = deque()
+    pool = ThreadPoolExecutor(max_workers=1)
+
+    def submit(snap: str) -> None:
+        tmp = Path(tempfile.mkdtemp(prefix="paperless-restore."))
+        pending.append((snap, tmp, pool.submit(fetch_snapshot, snap, tmp, skip)))
+
+    try:
+        for snap in islice(queue, RESTORE_PREFETCH + 1):
+            submit(snap)
+        while pending:
+            snap, tmp, future = pending.popleft()
+            yield snap, tmp, future.result()
+            following = next(queue, None)
+            if following:
+                submit(following)
+    finally:
+        for _, _, future in pending:
+            future.cancel()
+        pool.shutdown(wait=True)
+        for _, tmp, _ in pending:
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+def restore_dirs(
+    snap_dir: Path, targets: list[tuple[str, Path]], compression: str = "",
+    remote: RemoteTarballs | None = None,
+) -> dict[str, bool]:
+    """restore_dir() for several (name, dest) pairs at once, RESTORE_WORKERS at a time.
+
+    The directories are independent, so only the order of snapshots within
+    each directory matters; the caller finishes one snapshot before the next.
+    """
+    with ThreadPoolExecutor(max_workers=RESTORE_WORKERS) as pool:
+        futures = {
+            name: pool.submit(restore_dir, snap_dir, name, dest, compression, remote)
+            for name, dest in targets
+        }
+    return {name: future.result() for name, future in futures.items()}
+
+
+def read_compression(snap_dir: Path) -> str:
+    """Return the compression recorded in a downloaded snapshot's manifest."""
+    manifest = snap_dir / "manifest.yaml"
+    if not manifest.exists():
+        return ""
+    return parse_manifest(manifest.read_text()).get("compression", "")
+
+
+def has_archive(snap_dir: Path, name: str, remote: RemoteTarballs | None = None) -> bool:
+    """Check whether a snapshot holds `name` as tarballs or as a chunk index."""
+    streamed = select_tarballs(remote.filenames, name) if remote else []
+    return (
+        bool(find_tarballs(snap_dir, name) or streamed)
+        or (snap_dir / index_name(name)).exists()
+    )
+
+
+def restore_dir(
+    snap_dir: Path, name: str, dest: Path, compression: str = "",
+    remote: RemoteTarballs | None = None,
+) -> bool:
+    """Restore `name` from a snapshot into dest; return False if it is absent.
+
+    Chunk-format snapshots are rebuilt from the instance's chunk store,
+    tarball snapshots are extracted in place (or streamed from the remote).
+    """
+    index = snap_dir / index_name(name)
+    if index.exists():
+        count = restore_index(index, f"{REMOTE}/{CHUNKS_DIR}", dest)
+        say(f"Rebuilt {count} {name} file(s) from the chunk store")
+        return True
+    tarballs = find_tarballs(snap_dir, name)
+    for tarfile_path in tarballs:
+        extract_tar(tarfile_path, dest, compression, progress=_track)
+    streamed = select_tarballs(remote.filenames, name) if remote else []
+    for filename in streamed:
+        stream_tar(f"{remote.remote_dir}/{filename}", dest, compression, progress=_track)
+    return bool(tarballs or streamed)
+
+
+def restore_db(dump: Path, compression: str = "", database: str = "") -> bool:
+    """Recreate database from a dump, reporting how long each phase took.
+
+    Returns False if the dump did not load cleanly (pg_restore or psql
+    failed, or a RESTORE_DB_FAST load was rolled back); the caller decides
+    whether the database is still usable.
+
+    With RESTORE_DB_FAST the load runs with synchronous_commit off and a
+    larger maintenance_work_mem; a plain dump is loaded as one transaction
+    (an error rolls the whole load back instead of leaving a partial
+    database). Directory-format dumps are restored section by section:
+    schema, then data in parallel, then indexes and constraints in
+    parallel. Statistics are rebuilt with ANALYZE at the end.
+    """
+    database = database or POSTGRES_DB
+    timings: dict[str, float] = {}
     say("Restoring database...")
+    if _progress is not None:
+        _progress.update(phase="database")
+    start = time.monotonic()
     subprocess.run(_compose_cmd("up", "-d", "db"), check=True)
-    time.sleep(5)
-    
+    if not wait_for_db():
+        die("Database did not become ready within 60s")
+    timings["startup"] = time.monotonic() - start
+
     # Completely drop and recreate the database to handle corrupted catalogs
     # Using postgres database to issue DROP/CREATE commands
     say("Dropping and recreating database...")
+    start = time.monotonic()
     subprocess.run(
         _compose_cmd("exec", "-T", "db", "psql", "-U", POSTGRES_USER, "-d", "postgres",
-                     "-c", f"DROP DATABASE IF EXISTS {POSTGRES_DB};"),
+                     "-c", f"DROP DATABASE IF EXISTS {database};"),
         check=False
     )
     subprocess.run(
         _compose_cmd("exec", "-T", "db", "psql", "-U", POSTGRES_USER, "-d", "postgres",
-                     "-c", f"CREATE DATABASE {POSTGRES_DB} OWNER {POSTGRES_USER};"),
+                     "-c", f"CREATE DATABASE {database} OWNER {POSTGRES_USER};"),
         check=True
     )
-    
-    # Restore from dump (handle gzipped or plain SQL)
-    if dump.suffix == ".gz":
-        proc = subprocess.Popen(["gunzip", "-c", str(dump)], stdout=subprocess.PIPE)
-        subprocess.run(
-            _compose_cmd("exec", "-T", "db", "psql", "-U", POSTGRES_USER, "-d", POSTGRES_DB),
-            stdin=proc.stdout,
-            check=False
-        )
-    else:
-        with open(dump, "rb") as fh:
-            subprocess.run(
-                _compose_cmd("exec", "-T", "db", "psql", "-U", POSTGRES_USER, "-d", POSTGRES_DB),
-                stdin=fh,
+    timings["create"] = time.monotonic() - start
+
+    # Session settings for the loading connections only (server config is untouched)
+    env = []
+    if RESTORE_DB_FAST:
+        env = ["-e", f"PGOPTIONS=-c synchronous_commit=off -c maintenance_work_mem={RESTORE_DB_MAINTENANCE_MEM}"]
+
+    # Directory-format dumps (postgres.dump/) are loaded in parallel by pg_restore
+    if dump.is_dir():
+        say(f"Loading directory-format dump with {RESTORE_DB_JOBS} parallel jobs...")
+        container_dir = "/tmp/paperless-restore.dump"
+        start = time.monotonic()
+        subprocess.run(_compose_cmd("exec", "-T", "db", "rm", "-rf", container_dir), check=False)
+        subprocess.run(_compose_cmd("cp", str(dump), f"db:{container_dir}"), check=True)
+        timings["copy"] = time.monotonic() - start
+        # One pg_restore per section: same order pg_restore uses anyway, but timed separately
+        failed = False
+        for section, phase in (("pre-data", "schema"), ("data", "load"), ("post-data", "indexes")):
+            start = time.monotonic()
+            result = subprocess.run(
+                _compose_cmd("exec", "-T", *env, "db", "pg_restore", "-U", POSTGRES_USER, "-d", database,
+                             "-j", str(RESTORE_DB_JOBS), f"--section={section}", container_dir),
                 check=False
             )
+            timings[phase] = time.monotonic() - start
+            failed = failed or result.returncode != 0
+        if failed:
+            warn("pg_restore reported errors (see output above)")
+        loaded = not failed
+        subprocess.run(_compose_cmd("exec", "-T", "db", "rm", "-rf", container_dir), check=False)
+    else:
+        # Restore from dump (handle compressed or plain SQL); pg_dump's plain
+        # output already creates indexes and constraints after the data
+        psql = _compose_cmd("exec", "-T", *env, "db", "psql", "-U", POSTGRES_USER, "-d", database)
+        if RESTORE_DB_FAST:
+            psql += ["--single-transaction", "-v", "ON_ERROR_STOP=1"]
+        start = time.monotonic()
+        codec = codec_for_file(dump, compression)
+        # The dump file is relayed through here so the progress can count it
+        if codec.program:
+            proc = subprocess.Popen(codec.decompress_cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+            load = subprocess.Popen(psql, stdin=proc.stdout)
+            proc.stdout.close()
+            with open(dump, "rb") as fh:
+                relay(fh, proc.stdin, _track)
+            if proc.wait() != 0:
+                warn(f"Could not decompress {dump.name}")
+        else:
+            load = subprocess.Popen(psql, stdin=subprocess.PIPE)
+            with open(dump, "rb") as fh:
+                relay(fh, load.stdin, _track)
+        result = subprocess.CompletedProcess(psql, load.wait())
+        timings["load"] = time.monotonic() - start
+        loaded = result.returncode == 0 and (not codec.program or proc.returncode == 0)
+        if result.returncode != 0 and RESTORE_DB_FAST:
+            warn("Database load failed and was rolled back (see output above)")
+        elif result.returncode != 0:
+            warn("psql reported errors (see output above)")
 
+    say("Updating planner statistics...")
+    start = time.monotonic()
+    subprocess.run(
+        _compose_cmd("exec", "-T", "db", "vacuumdb", "-U", POSTGRES_USER, "-d", database,
+                     "--analyze-only", "-j", str(RESTORE_DB_JOBS), "-q"),
+        check=False
+    )
+    timings["analyze"] = time.monotonic() - start
+    for phase, elapsed in timings.items():
+        say(f"  {phase:<10} {elapsed:7.1f}s")
+    if loaded:
+        ok(f"Database restored in {sum(timings.values()):.1f}s")
+    else:
+        warn(f"Database restore finished with errors after {sum(timings.values()):.1f}s")
+    return loaded
 
-def main() -> None:
-    snaps = fetch_snapshots()
-    if not snaps:
-        die(f"No snapshots found in {REMOTE}")
-    names = [n for n, _, _ in snaps]
-    target = sys.argv[1] if len(sys.argv) > 1 else names[-1]
-    if target not in names:
-        die(f"Snapshot {target} not found")
-    meta = {n: (m, p) for n, m, p in snaps}
-    chain = []
-    cur = target
-    while True:
-        chain.append(cur)
-        mode, parent = meta.get(cur, ("full", ""))
-        # Stop at full backups, archive backups (standalone), or if no valid parent
-        if mode in ("full", "archive") or not parent or parent == "?":
-            break
-        cur = parent
-    chain.reverse()
-    say("Restoring chain: " + " -> ".join(chain))
-    
-    # Check restore mode:
-    # - MERGE_CONFIG=yes: Skip .env and docker-compose.yml restoration (new instance restore)
-    #   The manager already created these with user's chosen settings + credentials from backup
-    # - MERGE_CONFIG=no: Fully overwrite .env and docker-compose.yml from backup (same instance restore)
-    skip_config = os.environ.get("MERGE_CONFIG", "no") == "yes"
-    # RESTORE_SYNCTHING: Override syncthing behavior for system restore
-    # When true, restore syncthing config even if skip_config is true
-    force_syncthing_restore = os.environ.get("RESTORE_SYNCTHING", "no") == "yes"
-    if skip_config:
-        say("Keeping instance configuration (already configured by manager)")
-    
-    # Stop existing containers if compose file exists
-    if COMPOSE_FILE.exists():
-        subprocess.run(_compose_cmd("down"), check=False)
-    dump_dir = Path(tempfile.mkdtemp(prefix="paperless-restore-dump."))
+
+def staging_root() -> Path:
+    """Sibling of DATA_ROOT that a staged restore extracts into (same filesystem, so renames are cheap)."""
+    return DATA_ROOT.parent / f".{DATA_ROOT.name}.restore"
+
+
+def previous_root() -> Path:
+    """Where a staged restore keeps the tree it replaced."""
+    return DATA_ROOT.parent / f".{DATA_ROOT.name}.pre-restore"
+
+
+def live_paths() -> dict[str, Path]:
+    """Names used inside a staging/previous tree -> the live path they replace."""
+    return {
+        "data": DATA_ROOT / "data",
+        "media": DATA_ROOT / "media",
+        "export": DATA_ROOT / "export",
+        "syncthing-config": STACK_DIR / "syncthing-config",
+        ".env": STACK_DIR / ".env",
+        COMPOSE_FILE.name: COMPOSE_FILE,
+    }
+
+
+def stack_running() -> bool:
+    result = subprocess.run(
+        _compose_cmd("ps", "--services", "--status", "running"), capture_output=True, text=True, check=False
+    )
+    return result.returncode == 0 and "db" in result.stdout.split()
+
+
+def psql_admin(sql: str) -> subprocess.CompletedProcess:
+    """Run SQL against the maintenance database (for statements about other databases)."""
+    return subprocess.run(
+        _compose_cmd("exec", "-T", "db", "psql", "-U", POSTGRES_USER, "-d", "postgres",
+                     "-v", "ON_ERROR_STOP=1", "-tAc", sql),
+        capture_output=True, text=True, check=False
+    )
+
+
+def database_exists(database: str) -> bool:
+    return psql_admin(f"SELECT 1 FROM pg_database WHERE datname = '{database}'").stdout.strip() == "1"
+
+
+def set_read_only(database: str, enabled: bool) -> None:
+    """Make new sessions on database read-only (or undo it).
+
+    Existing sessions are closed when enabling, so the running stack
+    reconnects under the new default and cannot write while a staged
+    restore is in progress.
+    """
+    if not enabled:
+        psql_admin(f"ALTER DATABASE {database} RESET default_transaction_read_only")
+        return
+    result = psql_admin(f"ALTER DATABASE {database} SET default_transaction_read_only = on")
+    if result.returncode != 0:
+        warn(f"Could not make {database} read-only; changes made during the restore will be lost")
+        return
+    psql_admin(
+        "SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+        f"WHERE datname = '{database}' AND pid <> pg_backend_pid()"
+    )
+
+
+def wait_for_db(timeout: int = 60) -> bool:
+    """Wait until the db service accepts TCP connections (not just the init socket)."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        ready = subprocess.run(
+            _compose_cmd("exec", "-T", "db", "pg_isready", "-h", "127.0.0.1", "-U", POSTGRES_USER),
+            capture_output=True, check=False
+        )
+        if ready.returncode == 0:
+            return True
+        time.sleep(1)
+    return False
+
+
+def swap_trees(incoming: Path, outgoing: Path, incoming_db: str, outgoing_db: str) -> None:
+    """Stop the stack and swap a prepared tree and database in.
+
+    Everything in incoming replaces its live path (see live_paths()); what
+    it replaces moves to outgoing. POSTGRES_DB becomes outgoing_db and
+    incoming_db (if present) becomes POSTGRES_DB. Leaves only db running.
+    """
+    say("Stopping the stack to swap in the restored data...")
+    started = time.monotonic()
+    subprocess.run(_compose_cmd("down"), check=False)
+    subprocess.run(_compose_cmd("up", "-d", "db"), check=True)
+    if not wait_for_db():
+        die("Database did not come up; nothing was swapped (staged data left in place)")
+    if database_exists(incoming_db):
+        for sql in (
+            f"DROP DATABASE IF EXISTS {outgoing_db}",
+            f"ALTER DATABASE {POSTGRES_DB} RENAME TO {outgoing_db}",
+            f"ALTER DATABASE {incoming_db} RENAME TO {POSTGRES_DB}",
+        ):
+            result = psql_admin(sql)
+            if result.returncode != 0 and "does not exist" not in result.stderr:
+                die(f"Database swap failed at '{sql}': {result.stderr.strip()}")
+        psql_admin(f"ALTER DATABASE {outgoing_db} RESET default_transaction_read_only")
+    psql_admin(f"ALTER DATABASE {POSTGRES_DB} RESET default_transaction_read_only")
+
+    # incoming/SWAPPED_LIST names what the swap that produced it moved in, so
+    # a rollback also removes paths that did not exist before the restore
+    swapped_list = incoming / SWAPPED_LIST
+    names = set(swapped_list.read_text().split("\n")) if swapped_list.exists() else set()
+    shutil.rmtree(outgoing, ignore_errors=True)
+    outgoing.mkdir(parents=True)
+    swapped = []
+    for name, live in live_paths().items():
+        if not (incoming / name).exists() and name not in names:
+            continue
+        if live.exists():
+            shutil.move(str(live), outgoing / name)
+        if (incoming / name).exists():
+            live.parent.mkdir(parents=True, exist_ok=True)
+            shutil.move(str(incoming / name), live)
+        swapped.append(name)
+    (outgoing / SWAPPED_LIST).write_text("\n".join(swapped))
+    shutil.rmtree(incoming, ignore_errors=True)
+    ok(f"Swapped in restored data ({time.monotonic() - started:.0f}s with the stack stopped)")
+
+
+def discard_staging() -> None:
+    """Drop what a failed staged restore prepared and reopen the live database for writes."""
+    set_read_only(POSTGRES_DB, False)
+    result = psql_admin(f"DROP DATABASE IF EXISTS {POSTGRES_DB}{STAGING_DB_SUFFIX}")
+    if result.returncode != 0:
+        warn(f"Could not drop {POSTGRES_DB}{STAGING_DB_SUFFIX}: {result.stderr.strip()}")
+    shutil.rmtree(staging_root(), ignore_errors=True)
+
+
+def rollback() -> None:
+    """Undo the last staged restore: swap the kept tree and database back in."""
+    previous = previous_root()
+    if not previous.is_dir():
+        die(f"Nothing to roll back ({previous} does not exist)")
+    swap_trees(previous, staging_root(), f"{POSTGRES_DB}{PREVIOUS_DB_SUFFIX}", f"{POSTGRES_DB}{STAGING_DB_SUFFIX}")
+    subprocess.run(_compose_cmd("up", "-d"), check=False)
+    ok(f"Rolled back; the undone restore is kept in {staging_root()}")
+
+
+def extract_chain(
+    chain: list[str], data_root: Path, stack_dir: Path, compose_file: Path,
+    dump_dir: Path, skip_config: bool, force_syncthing_restore: bool,
+    dirs: tuple[str, ...] = DATA_DIRS,
+) -> tuple[Path | None, str]:
+    """Extract the chain's files and config under data_root / stack_dir.
+
+    All data directories are emptied, but only those in dirs are restored.
+    The newest database dump is moved into dump_dir (warning if it is not
+    the chain tip's); returns it (or None) with its compression.
+    """
     final_dump: Path | None = None
+    dump_compression = ""
+    dump_snapshot = ""
     first = True
-    for snap in chain:
-        tmp = Path(tempfile.mkdtemp(prefix="paperless-restore."))
-        subprocess.run(["rclone", "sync", f"{REMOTE}/{snap}", str(tmp)], check=True)
+    skip = tuple(name for name in DATA_DIRS if name not in dirs)
+    if _progress is not None:
+        _progress.update(phase="download", snapshot=chain[0], member=f"1/{len(chain)}")
+    for snap, tmp, remote in prefetch_snapshots(chain, skip):
+        if _progress is not None:
+            _progress.update(phase="extract", snapshot=snap, member=f"{chain.index(snap) + 1}/{len(chain)}")
+        compression = read_compression(tmp)
         if first:
             # Handle .env restoration
             backup_env = tmp / ".env"
             if backup_env.exists():
-                STACK_DIR.mkdir(parents=True, exist_ok=True)
+                stack_dir.mkdir(parents=True, exist_ok=True)
                 if skip_config:
                     # New instance restore: manager already created .env with correct settings
                     say("Keeping instance .env (configured by manager)")
                 else:
                     # Same instance restore: replace .env from backup
-                    (STACK_DIR / ".env").write_text(backup_env.read_text())
+                    (stack_dir / ".env").write_text(backup_env.read_text())
                     ok("Restored .env from backup")
             
             # Restore data directories
-            for name in ["data", "media", "export"]:
-                dest = DATA_ROOT / name
+            for name in DATA_DIRS:
+                dest = data_root / name
                 dest.mkdir(parents=True, exist_ok=True)  # Ensure destination exists
                 if dest.exists() and any(dest.iterdir()):  # Only remove if not empty
                     subprocess.run(["rm", "-rf", str(dest)], check=False)
                 dest.mkdir(parents=True, exist_ok=True)  # Recreate after removal
-                tarfile_path = next(tmp.glob(f"{name}.tar*"), None)
-                if tarfile_path:
-                    extract_tar(tarfile_path, DATA_ROOT)
+            restored = restore_dirs(tmp, [(name, data_root) for name in dirs], compression, remote)
+            for name, done in restored.items():
+                if done:
                     ok(f"Restored {name} data")
             
             # Restore syncthing-config if it exists in backup (consume folder sync config)
             # Skip for clones (MERGE_CONFIG=yes without RESTORE_SYNCTHING) - clones need fresh setup
             # But DO restore for system restore (MERGE_CONFIG=yes WITH RESTORE_SYNCTHING=yes)
-            syncthing_tarfile = next(tmp.glob("syncthing-config.tar*"), None)
-            if syncthing_tarfile:
+            if has_archive(tmp, "syncthing-config", remote):
                 if skip_config and not force_syncthing_restore:
                     say("Skipping syncthing-config (clone needs fresh consume folder setup)")
                 else:
-                    syncthing_config_dir = STACK_DIR / "syncthing-config"
+                    syncthing_config_dir = stack_dir / "syncthing-config"
                     syncthing_config_dir.mkdir(parents=True, exist_ok=True)
-                    extract_tar(syncthing_tarfile, STACK_DIR)
+                    restore_dir(tmp, "syncthing-config", stack_dir, compression, remote)
                     
                     # CRITICAL: Set ownership to match Syncthing container (UID 1000)
                     # This ensures the container can read its config.xml with device/folder settings
@@ -251,29 +638,523 @@ def main() -> None:
                     say("Keeping instance docker-compose.yml (configured by manager)")
                 else:
                     # Same instance restore: replace docker-compose.yml from backup
-                    COMPOSE_FILE.parent.mkdir(parents=True, exist_ok=True)
-                    compose_snap.replace(COMPOSE_FILE)
+                    compose_file.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.move(str(compose_snap), compose_file)
                     ok("Restored docker-compose.yml from backup")
             first = False
         else:
             # Incremental snapshots - skip syncthing-config for clones
-            for name in ["data", "media", "export"]:
-                tarfile_path = next(tmp.glob(f"{name}.tar*"), None)
-                if tarfile_path:
-                    extract_tar(tarfile_path, DATA_ROOT)
+            targets = [(name, data_root) for name in dirs]
             # Only restore syncthing-config for same-instance restores
             if not skip_config:
-                syncthing_tarfile = next(tmp.glob("syncthing-config.tar*"), None)
-                if syncthing_tarfile:
-                    extract_tar(syncthing_tarfile, STACK_DIR)
+                targets.append(("syncthing-config", stack_dir))
+            restore_dirs(tmp, targets, compression, remote)
         dump = next(tmp.glob("postgres.sql*"), None)
+        if dump is None and (tmp / "postgres.dump").is_dir():
+            dump = tmp / "postgres.dump"
         if dump:
+            # Only the newest dump is kept; a directory-format dump moved onto an
+            # existing one would otherwise land inside it
+            if final_dump is not None:
+                if final_dump.is_dir():
+                    shutil.rmtree(final_dump)
+                else:
+                    final_dump.unlink(missing_ok=True)
             final_dump = dump_dir / dump.name
+            dump_compression = compression
+            dump_snapshot = snap
             shutil.move(str(dump), final_dump)
         shutil.rmtree(tmp)
-    if final_dump:
-        restore_db(final_dump)
-    shutil.rmtree(dump_dir, ignore_errors=True)
+    if final_dump is not None and dump_snapshot != chain[-1]:
+        warn(f"{chain[-1]} has no database dump; restoring the database from {dump_snapshot} "
+             "(documents added since then have no database rows)")
+    return final_dump, dump_compression
+
+
+def start_media_restore(chain: list[str]) -> None:
+    """Run restore_media() for chain in a detached process that outlives this one."""
+    log = STACK_DIR / MEDIA_LOG
+    env = dict(os.environ, STACK_DIR=str(STACK_DIR), DATA_ROOT=str(DATA_ROOT), ENV_FILE=str(ENV_FILE),
+               INSTANCE_NAME=INSTANCE_NAME, RCLONE_REMOTE_NAME=RCLONE_REMOTE_NAME,
+               RCLONE_REMOTE_PATH=RCLONE_REMOTE_PATH)
+    with open(log, "ab") as out:
+        subprocess.Popen(
+            [sys.executable, str(Path(__file__).resolve()), "media", *chain],
+            stdin=subprocess.DEVNULL, stdout=out, stderr=subprocess.STDOUT,
+            env=env, start_new_session=True,
+        )
+    ok("Media is being restored in the background")
+    say(f"  Progress: {STACK_DIR / MEDIA_PROGRESS} (log: {log})")
+
+
+def media_stage_root() -> Path:
+    """Where a background media restore extracts the chain before publishing it."""
+    return DATA_ROOT.parent / f".{DATA_ROOT.name}.media-restore"
+
+
+def publish_media(stage: Path, published: dict[str, tuple[int, int]]) -> int:
+    """Hard-link the files staged under stage/media into DATA_ROOT/media.
+
+    published maps each relative path this restore put in place to its
+    (staged inode, live inode). A live file is only (re)placed if it is
+    missing or still the one this restore put there, so documents the
+    running stack stored meanwhile are never touched. Returns the number
+    of files placed.
+    """
+    staged_root, live_root = stage / "media", DATA_ROOT / "media"
+    placed = 0
+    for root, _, files in os.walk(staged_root):
+        rel_dir = Path(root).relative_to(staged_root)
+        live_dir = live_root / rel_dir
+        if not live_dir.exists():
+            live_dir.mkdir(parents=True)
+            st = os.stat(root)
+            os.chown(live_dir, st.st_uid, st.st_gid)
+            shutil.copystat(root, live_dir)
+        for fname in files:
+            rel = str(rel_dir / fname)
+            staged, live = Path(root) / fname, live_dir / fname
+            staged_ino = staged.lstat().st_ino
+            try:
+                live_ino = live.lstat().st_ino
+            except FileNotFoundError:
+                live_ino = None
+            previous = published.get(rel)
+            if live_ino is not None and (previous is None or previous[1] != live_ino):
+                continue  # stored by the running stack since the restore began
+            if previous is not None and previous[0] == staged_ino:
+                continue  # unchanged by this chain member
+            part = live_dir / f".{fname}.restore"
+            part.unlink(missing_ok=True)
+            try:
+                os.link(staged, part, follow_symlinks=False)
+            except OSError:  # media on another filesystem than the stage
+                shutil.copy2(staged, part, follow_symlinks=False)
+            os.replace(part, live)
+            published[rel] = (staged_ino, live.lstat().st_ino)
+            placed += 1
+    return placed
+
+
+def retire_media(stage: Path, published: dict[str, tuple[int, int]]) -> int:
+    """Remove published files the chain deleted later on; returns how many.
+
+    Only files that are still exactly what this restore put there go.
+    """
+    removed = 0
+    for rel, (_, live_ino) in published.items():
+        if os.path.lexists(stage / "media" / rel):
+            continue
+        live = DATA_ROOT / "media" / rel
+        try:
+            if live.lstat().st_ino == live_ino:
+                live.unlink()
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def restore_media(chain: list[str]) -> None:
+    """Stream the chain's media archives into DATA_ROOT/media, reporting progress.
+
+    Runs after the stack is already serving, so the archives are never
+    extracted into the live tree: an incremental extraction deletes every
+    file its directory listings do not name, including documents stored
+    since the restore began. The chain is extracted (streamed, in order)
+    into a stage beside DATA_ROOT instead, and after each member the
+    staged files are hard-linked into place by publish_media(). Files the
+    chain deleted are retired at the end; anything else the stack stored
+    meanwhile is left alone.
+    """
+    files = chain_files(chain, ("media.tar*", "media-store.tar"))
+    if files is None:
+        die(f"Could not list {REMOTE}")
+    total = sum(size for snap in chain for size in files[snap].values())
+    progress = Progress(STACK_DIR / MEDIA_PROGRESS, chain, total, label="Media")
+    stage = media_stage_root()
+    shutil.rmtree(stage, ignore_errors=True)
+    (stage / "media").mkdir(parents=True)
+    published: dict[str, tuple[int, int]] = {}
+    try:
+        for position, snap in enumerate(chain, 1):
+            progress.update(snapshot=snap, member=f"{position}/{len(chain)}")
+            with tempfile.TemporaryDirectory(prefix="paperless-media.") as scratch:
+                tmp = Path(scratch)
+                subprocess.run(
+                    ["rclone", "copy", f"{REMOTE}/{snap}", str(tmp),
+                     "--include", "/manifest.yaml", "--include", f"/{index_name('media')}"],
+                    check=True
+                )
+                compression = read_compression(tmp)
+                if (tmp / index_name("media")).exists():
+                    restore_index(tmp / index_name("media"), f"{REMOTE}/{CHUNKS_DIR}", stage)
+                for filename in select_tarballs(files[snap], "media"):
+                    say(f"Streaming {snap}/{filename}")
+                    stream_tar(f"{REMOTE}/{snap}/{filename}", stage, compression,
+                               progress=progress.advance)
+            say(f"Published {publish_media(stage, published)} media file(s) from {snap}")
+        removed = retire_media(stage, published)
+        if removed:
+            say(f"Removed {removed} media file(s) deleted later in the chain")
+    except Exception as e:
+        progress.update(state="failed", error=str(e))
+        die(f"Background media restore failed: {e} (staged files left in {stage})")
+    shutil.rmtree(stage, ignore_errors=True)
+    progress.update(state="done", done_bytes=total)
+    ok("Media restore complete")
+
+
+def resolve_chain(target: str = "") -> list[str]:
+    """Snapshots needed to restore target (default: the latest), oldest first."""
+    snaps = fetch_snapshots()
+    if not snaps:
+        die(f"No snapshots found in {REMOTE}")
+    names = [n for n, _, _ in snaps]
+    target = target or names[-1]
+    if target not in names:
+        die(f"Snapshot {target} not found")
+    meta = {n: (m, p) for n, m, p in snaps}
+    chain = []
+    cur = target
+    while True:
+        chain.append(cur)
+        mode, parent = meta.get(cur, ("full", ""))
+        # Stop at full backups, archive backups (standalone), or if no valid parent
+        if mode in ("full", "archive") or not parent or parent == "?":
+            break
+        cur = parent
+    chain.reverse()
+    return chain
+
+
+def chain_files(chain: list[str], patterns: tuple[str, ...] = ("**",)) -> dict[str, dict[str, int]] | None:
+    """{snapshot: {filename: size}} of the chain's files matching patterns (one listing).
+
+    Files below a snapshot's top level, such as the parts of a
+    directory-format postgres.dump/, are keyed by their relative path.
+    Returns None when the remote could not be listed.
+    """
+    includes = [arg for snap in chain for pattern in patterns for arg in ("--include", f"/{snap}/{pattern}")]
+    listing = subprocess.run(
+        ["rclone", "lsjson", REMOTE, "-R", "--files-only", "--no-modtime", *includes],
+        capture_output=True, text=True, check=False
+    )
+    if listing.returncode != 0:
+        return None
+    files: dict[str, dict[str, int]] = {snap: {} for snap in chain}
+    for item in json.loads(listing.stdout or "[]"):
+        # Snapshot names may contain a slash themselves (archive/<name>)
+        path = item["Path"]
+        snap = next((name for name in chain if path.startswith(f"{name}/")), None)
+        if snap is not None:
+            files[snap][path[len(snap) + 1:]] = item["Size"]
+    return files
+
+
+def restore_total(files: dict[str, dict[str, int]], dirs: tuple[str, ...]) -> int:
+    """Bytes a restore of dirs moves, as counted by its progress.
+
+    That is every file downloaded, every tarball again as it is fed to tar
+    (once only when streamed) and the newest plain SQL dump as it is fed
+    to psql. Files of chunk-format snapshots are rebuilt from the chunk
+    store and not counted.
+    """
+    skipped = [name for name in DATA_DIRS if name not in dirs]
+    total = dump = 0
+    for names in files.values():  # chain order: the last dump found is the one loaded
+        for filename, size in names.items():
+            if is_tarball(filename):
+                if tarball_dir_name(Path(filename)) not in skipped:
+                    total += size if RESTORE_STREAM else 2 * size
+            elif filename.endswith((".snar", FILE_INDEX_SUFFIX)):
+                continue  # not needed to restore; skipped except by a plain sync
+            elif filename not in [index_name(name) for name in skipped]:
+                total += size
+                if filename.startswith("postgres.sql"):
+                    dump = size
+    return total + dump
+
+
+def fetch_indexes(chain: list[str], local: Path) -> None:
+    """Download the per-file/chunk indexes and manifests of the chain into local/<snapshot>/ (one call)."""
+    includes = []
+    for snap in chain:
+        for pattern in (f"*{FILE_INDEX_SUFFIX}", f"*{CHUNK_INDEX_SUFFIX}", "manifest.yaml"):
+            includes += ["--include", f"/{snap}/{pattern}"]
+    subprocess.run(["rclone", "copy", REMOTE, str(local), *includes], check=True)
+
+
+def _existing_dir(path: Path) -> Path:
+    while not path.exists() and path != path.parent:
+        path = path.parent
+    return path
+
+
+def _tree_bytes(paths: list[Path]) -> int:
+    existing = [str(p) for p in paths if p.exists()]
+    if not existing:
+        return 0
+    result = subprocess.run(["du", "-sbc", *existing], capture_output=True, text=True, check=False)
+    lines = result.stdout.strip().splitlines()
+    return int(lines[-1].split()[0]) if result.returncode == 0 and lines else 0
+
+
+def restored_bytes(chain: list[str]) -> int | None:
+    """Size of the tree the chain restores, from its per-file or chunk indexes (None without indexes).
+
+    Every path counts once, at its newest size; files deleted later in the
+    chain are still counted, so this errs on the high side.
+    """
+    with tempfile.TemporaryDirectory(prefix="paperless-preflight.") as scratch:
+        local = Path(scratch)
+        fetch_indexes(chain, local)
+        chunk_indexes = list((local / chain[-1]).glob(f"*{CHUNK_INDEX_SUFFIX}"))
+        if chunk_indexes:
+            return sum(e.get("size", 0) for index in chunk_indexes for e in chunk_read_index(index))
+        indexes = [
+            (snap, index.name[:-len(FILE_INDEX_SUFFIX)], index)
+            for snap in reversed(chain)
+            for index in sorted((local / snap).glob(f"*{FILE_INDEX_SUFFIX}"))
+        ]
+        if not indexes:
+            return None
+        return sum(e.size for entries in locate_files(indexes, ["*"]).values() for e in entries)
+
+
+def preflight(chain: list[str], staged: bool) -> None:
+    """Check the chain and the disk space before anything live is touched; dies on failure.
+
+    Every chain member must be listed in the catalog and present on the
+    remote, its archives must match the manifest's sha256/size records, and
+    the chain must start at a full or archive snapshot. The restore needs
+    room for the restored tree (less the live tree it replaces, unless
+    staged) and for the snapshots being downloaded at once.
+    """
+    say("Pre-flight: checking the restore chain before stopping anything...")
+    catalog = read_catalog(REMOTE) or load_catalog(REMOTE)
+    problems = []
+    first_mode = catalog.get(chain[0], {}).get("manifest", {}).get("mode")
+    if first_mode not in ("full", "archive"):
+        problems.append(f"the chain starts at {chain[0]} ({first_mode or 'unknown'} snapshot); its parent is missing")
+
+    files = chain_files(chain)
+    if files is None:
+        die(f"Pre-flight: could not list {REMOTE}")
+    tar_sizes = {snap: sum(n for f, n in files[snap].items() if is_tarball(f)) for snap in chain}
+    other_sizes = {snap: sum(n for f, n in files[snap].items() if not is_tarball(f)) for snap in chain}
+    for snap in chain:
+        if not tar_sizes[snap] and not other_sizes[snap]:
+            problems.append(f"{snap} is missing on the remote")
+
+    digests = {snap: archive_digests(catalog.get(snap, {}).get("manifest", {})) for snap in chain}
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        bad = dict(zip(chain, pool.map(lambda snap: verify_remote(f"{REMOTE}/{snap}", digests[snap]), chain)))
+    for snap in chain:
+        problems += [f"{snap}/{filename} is missing or does not match its manifest" for filename in bad[snap]]
+        if not digests[snap] and tar_sizes[snap]:
+            warn(f"Pre-flight: {snap} has no integrity records; only checked that it exists")
+    if problems:
+        for problem in problems:
+            warn(f"  {problem}")
+        die("Pre-flight failed; nothing was stopped or changed")
+
+    # Disk space: the restored tree on DATA_ROOT's filesystem, the download window in the temp dir
+    restored = restored_bytes(chain)
+    if restored is None:
+        restored = sum(tar_sizes.values())  # compressed sizes: a lower bound
+        warn("Pre-flight: no per-file indexes; estimating the restored size from the archive sizes")
+    live = [DATA_ROOT / name for name in DATA_DIRS]
+    data_need = restored if staged else max(0, restored - _tree_bytes(live))
+    per_snapshot = [other_sizes[s] + (0 if RESTORE_STREAM else tar_sizes[s]) for s in chain]
+    window = RESTORE_PREFETCH + 1
+    download_need = max(sum(per_snapshot[i:i + window]) for i in range(len(chain)))
+    data_dir = _existing_dir(DATA_ROOT)
+    temp_dir = Path(tempfile.gettempdir())
+    needs = {data_dir: data_need}
+    if temp_dir.stat().st_dev == data_dir.stat().st_dev:
+        needs[data_dir] += download_need
+    else:
+        needs[temp_dir] = download_need
+    mib = 1048576
+    say(f"  {len(chain)} snapshot(s), {sum(tar_sizes.values()) / mib:.1f} MiB of archives, "
+        f"restored tree about {restored / mib:.1f} MiB")
+    for path, need in needs.items():
+        free = shutil.disk_usage(path).free
+        say(f"  {path}: needs {need * SPACE_MARGIN / mib:.1f} MiB, {free / mib:.1f} MiB free")
+        if need * SPACE_MARGIN > free:
+            die(f"Pre-flight failed: not enough space on {path}; nothing was stopped or changed")
+    ok("Pre-flight passed")
+
+
+def restore_files(target: str, patterns: list[str], dest: Path | None = None, db_rows: bool = False) -> int:
+    """Restore only the files matching patterns from target's chain.
+
+    Patterns are paths relative to DATA_ROOT (media/documents/originals/
+    0000042.pdf), directories or globs. Only the per-file indexes are
+    downloaded to plan the restore; matching members are then streamed out
+    of the tarballs that hold them. dest defaults to STACK_DIR/restored-<snapshot>.
+    With db_rows the database rows of the restored documents are exported
+    from target's dump to dest/documents.sql. Returns the number of files restored.
+    """
+    chain = resolve_chain(target)
+    target = chain[-1]
+    dest = dest or STACK_DIR / f"restored-{target.replace('/', '-')}"
+    dest.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="paperless-select.") as scratch:
+        local = Path(scratch)
+        fetch_indexes(chain, local)
+
+        restored: list[str] = []
+        chunk_indexes = sorted((local / target).glob(f"*{CHUNK_INDEX_SUFFIX}"))
+        if chunk_indexes:
+            # Chunk-format snapshots are self-contained: filter the target's indexes
+            for index in chunk_indexes:
+                selected = local / f"selected{CHUNK_INDEX_SUFFIX}"
+                if filter_chunk_index(index, patterns, selected):
+                    restore_index(selected, f"{REMOTE}/{CHUNKS_DIR}", dest)
+                restored += [e["path"] for e in chunk_read_index(selected) if e["type"] != "dir"]
+        else:
+            indexes = [
+                (snap, index.name[:-len(FILE_INDEX_SUFFIX)], index)
+                for snap in reversed(chain)
+                for index in sorted((local / snap).glob(f"*{FILE_INDEX_SUFFIX}"))
+            ]
+            if not indexes:
+                die("These snapshots have no per-file indexes; restore the whole snapshot instead")
+            for (snap, base), entries in locate_files(indexes, patterns).items():
+                listing = subprocess.run(
+                    ["rclone", "lsf", f"{REMOTE}/{snap}", "--files-only"],
+                    capture_output=True, text=True, check=True
+                )
+                tarball = next(
+                    (f for f in listing.stdout.splitlines() if is_tarball(f) and f.split(".tar", 1)[0] == base),
+                    None
+                )
+                if tarball is None:
+                    die(f"{snap} has an index for {base} but no {base}.tar* archive; cannot restore from it")
+                say(f"Extracting {len(entries)} file(s) from {snap}/{tarball}")
+                stream_tar(f"{REMOTE}/{snap}/{tarball}", dest, read_compression(local / snap),
+                           [e.path for e in entries])
+                restored += [e.path for e in entries]
+
+    for pattern in patterns:
+        if not any(path_matches(path, [pattern]) for path in restored):
+            warn(f"Nothing in the chain matches {pattern}")
+    ok(f"Restored {len(restored)} file(s) into {dest}")
+    if db_rows and restored:
+        export_rows(target, restored, dest / "documents.sql")
+    return len(restored)
+
+
+def export_rows(snapshot: str, paths: list[str], out: Path) -> None:
+    """Export the database rows of the documents behind paths from snapshot's dump."""
+    with tempfile.TemporaryDirectory(prefix="paperless-select-db.") as scratch:
+        local = Path(scratch)
+        subprocess.run(
+            ["rclone", "copy", f"{REMOTE}/{snapshot}", str(local), "--include", "/postgres.sql*"], check=True
+        )
+        dump = next(local.glob("postgres.sql*"), None)
+        if dump is None:
+            warn("Row export needs a plain SQL dump (postgres.sql*); this snapshot has none")
+            return
+        codec = codec_for_file(dump, read_compression(local))
+        if codec.program:
+            plain = local / "postgres.plain.sql"
+            with open(dump, "rb") as src, open(plain, "wb") as out_fh:
+                subprocess.run(list(codec.decompress_cmd), stdin=src, stdout=out_fh, check=True)
+            dump = plain
+        documents = export_document_rows(dump, paths, out)
+    if documents:
+        ok(f"Exported the rows of {documents} document(s) to {out}")
+    else:
+        warn("No database rows found for the restored files")
+
+
+def restore_files_main(args: list[str]) -> None:
+    """restore.py files <snapshot|latest> <path>... [--dest DIR] [--db-rows]"""
+    db_rows = "--db-rows" in args
+    args = [a for a in args if a != "--db-rows"]
+    dest = None
+    if "--dest" in args:
+        i = args.index("--dest")
+        if i + 1 >= len(args):
+            die("--dest needs a directory")
+        dest = Path(args[i + 1])
+        del args[i:i + 2]
+    if len(args) < 2:
+        die("Usage: restore.py files <snapshot|latest> <path>... [--dest DIR] [--db-rows]")
+    restore_files("" if args[0] == "latest" else args[0], args[1:], dest, db_rows)
+
+
+def main() -> None:
+    global _progress
+    chain = resolve_chain(sys.argv[1] if len(sys.argv) > 1 else "")
+    say("Restoring chain: " + " -> ".join(chain))
+    
+    # Check restore mode:
+    # - MERGE_CONFIG=yes: Skip .env and docker-compose.yml restoration (new instance restore)
+    #   The manager already created these with user's chosen settings + credentials from backup
+    # - MERGE_CONFIG=no: Fully overwrite .env and docker-compose.yml from backup (same instance restore)
+    skip_config = os.environ.get("MERGE_CONFIG", "no") == "yes"
+    # RESTORE_SYNCTHING: Override syncthing behavior for system restore
+    # When true, restore syncthing config even if skip_config is true
+    force_syncthing_restore = os.environ.get("RESTORE_SYNCTHING", "no") == "yes"
+    if skip_config:
+        say("Keeping instance configuration (already configured by manager)")
+    
+    staged = RESTORE_STAGED and COMPOSE_FILE.exists() and stack_running()
+    if RESTORE_STAGED and not staged:
+        warn("Stack is not running; restoring in place")
+    background_media = RESTORE_MEDIA_BACKGROUND and not staged
+    if RESTORE_MEDIA_BACKGROUND and staged:
+        warn("Staged restores swap media together with everything else; restoring it in the foreground")
+    if RESTORE_PREFLIGHT:
+        preflight(chain, staged)
+    dirs = tuple(name for name in DATA_DIRS if not (background_media and name == "media"))
+    files = chain_files(chain)
+    STACK_DIR.mkdir(parents=True, exist_ok=True)
+    _progress = Progress(STACK_DIR / RESTORE_PROGRESS, chain, restore_total(files, dirs) if files else 0)
+    say(f"Progress: {STACK_DIR / RESTORE_PROGRESS}")
+    try:
+        # Stop existing containers if compose file exists (a staged restore stops them only to swap)
+        if COMPOSE_FILE.exists() and not staged:
+            subprocess.run(_compose_cmd("down"), check=False)
+        dump_dir = Path(tempfile.mkdtemp(prefix="paperless-restore-dump."))
+        if staged:
+            # The running stack keeps serving (read-only) until the swap
+            staging = staging_root()
+            shutil.rmtree(staging, ignore_errors=True)
+            staging.mkdir(parents=True)
+            say(f"Staged restore into {staging} while the stack keeps running read-only")
+            set_read_only(POSTGRES_DB, True)
+            try:
+                final_dump, dump_compression = extract_chain(
+                    chain, staging, staging, staging / COMPOSE_FILE.name,
+                    dump_dir, skip_config, force_syncthing_restore,
+                )
+                # Never swap in a database that did not load: the live one is still intact
+                if final_dump and not restore_db(final_dump, dump_compression, f"{POSTGRES_DB}{STAGING_DB_SUFFIX}"):
+                    die("Database restore failed; nothing was swapped and the running instance is unchanged")
+            except BaseException:
+                discard_staging()
+                raise
+            swap_trees(staging, previous_root(), f"{POSTGRES_DB}{STAGING_DB_SUFFIX}", f"{POSTGRES_DB}{PREVIOUS_DB_SUFFIX}")
+            ok(f"Previous data kept in {previous_root()} (undo with: restore.py --rollback)")
+        else:
+            final_dump, dump_compression = extract_chain(
+                chain, DATA_ROOT, STACK_DIR, COMPOSE_FILE, dump_dir, skip_config, force_syncthing_restore, dirs,
+            )
+            if final_dump:
+                restore_db(final_dump, dump_compression)
+        shutil.rmtree(dump_dir, ignore_errors=True)
+    except BaseException as e:
+        _progress.update(state="failed", error=str(e) if isinstance(e, Exception) else type(e).__name__)
+        raise
+    _progress.update(state="done", phase="")
+    ok(f"Restored {format_bytes(_progress.state['done_bytes'])} in "
+       f"{format_eta(time.time() - _progress.state['started'])}")
+    _progress = None
     
     # Start services and run health check
     if COMPOSE_FILE.exists():
@@ -284,6 +1165,8 @@ def main() -> None:
             warn("Restore complete, but self-test failed")
     else:
         warn("Docker compose file missing after restore - backup may be incomplete")
+    if background_media:
+        start_media_restore(chain)
     
     # Restart Syncthing if it was enabled (syncthing-config was restored)
     # Skip for clones (skip_config=True without force_syncthing_restore)
@@ -385,6 +1268,9 @@ def _refresh_globals_from_env():
     """
     global INSTANCE_NAME, PROJECT_NAME, STACK_DIR, DATA_ROOT, COMPOSE_FILE
     global RCLONE_REMOTE_NAME, RCLONE_REMOTE_PATH, POSTGRES_DB, POSTGRES_USER, REMOTE, ENV_FILE
+    global RESTORE_DB_JOBS, RESTORE_DB_FAST, RESTORE_DB_MAINTENANCE_MEM
+    global RESTORE_STREAM, RESTORE_PREFETCH, RESTORE_WORKERS, RESTORE_STAGED, RESTORE_PREFLIGHT
+    global RESTORE_MEDIA_BACKGROUND, RESTORE_CACHE_GB, RESTORE_CACHE_DIR
     
     ENV_FILE = Path(os.environ.get("ENV_FILE", "/home/docker/paperless-setup/.env"))
     
@@ -401,6 +1287,17 @@ def _refresh_globals_from_env():
     RCLONE_REMOTE_PATH = os.environ.get("RCLONE_REMOTE_PATH", f"backups/paperless/{INSTANCE_NAME}")
     POSTGRES_DB = os.environ.get("POSTGRES_DB", "paperless")
     POSTGRES_USER = os.environ.get("POSTGRES_USER", "paperless")
+    RESTORE_DB_JOBS = max(1, int(os.environ.get("RESTORE_DB_JOBS", str(min(8, os.cpu_count() or 1)))))
+    RESTORE_DB_FAST = os.environ.get("RESTORE_DB_FAST", "no") == "yes"
+    RESTORE_DB_MAINTENANCE_MEM = os.environ.get("RESTORE_DB_MAINTENANCE_MEM", "512MB")
+    RESTORE_STREAM = os.environ.get("RESTORE_STREAM", "no") == "yes"
+    RESTORE_PREFETCH = max(0, int(os.environ.get("RESTORE_PREFETCH", "1")))
+    RESTORE_WORKERS = max(1, int(os.environ.get("RESTORE_WORKERS", "3")))
+    RESTORE_STAGED = os.environ.get("RESTORE_STAGED", "no") == "yes"
+    RESTORE_PREFLIGHT = os.environ.get("RESTORE_PREFLIGHT", "yes") == "yes"
+    RESTORE_MEDIA_BACKGROUND = os.environ.get("RESTORE_MEDIA_BACKGROUND", "no") == "yes"
+    RESTORE_CACHE_GB = max(0.0, float(os.environ.get("RESTORE_CACHE_GB", "0")))
+    RESTORE_CACHE_DIR = Path(os.environ.get("RESTORE_CACHE_DIR", ARTIFACT_CACHE_DIR))
     REMOTE = f"{RCLONE_REMOTE_NAME}:{RCLONE_REMOTE_PATH}"
 
 
@@ -423,7 +1320,14 @@ if __name__ == "__main__":
     tmp = None
     dump_dir = None
     try:
-        main()
+        if len(sys.argv) > 1 and sys.argv[1] == "--rollback":
+            rollback()
+        elif len(sys.argv) > 1 and sys.argv[1] == "files":
+            restore_files_main(sys.argv[2:])
+        elif len(sys.argv) > 2 and sys.argv[1] == "media":
+            restore_media(sys.argv[2:])
+        else:
+            main()
     except Exception as e:
         die(f"Restore failed: {e}")
     finally:
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Local cache of snapshot archives downloaded by restores.
+
+Restoring the same chain more than once - a retried restore, or one backup
+cloned into several test instances - downloads identical tarballs each
+time. The cache keeps them on local disk, shared by all instances, under
+the sha256 recorded in the snapshot manifest ("archive.<file>: ..."). A
+lookup needs both the remote path and that checksum; since objects are
+stored by checksum, the same archive reached through another path (an
+archive snapshot copied from a full) is a hit as well.
+
+Cached objects are handed out as hard links, so evicting one never pulls
+a file from under a running restore. The cache is bounded by size and
+evicts the least recently used objects first. index.json holds the
+entries and the hit/miss counters shown in the manager; updates take an
+flock so concurrent restores do not lose each other's changes.
+"""
+from __future__ import annotations
+
+import fcntl
+import json
+import os
+import shutil
+import subprocess
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterator
+
+from lib.utils.integrity import file_sha256
+
+
+INDEX_FILE = "index.json"
+LOCK_FILE = ".lock"
+OBJECTS_DIR = "objects"
+
+
+@dataclass
+class CacheStats:
+    """Counters and current size of an artifact cache."""
+    objects: int = 0
+    size: int = 0
+    hits: int = 0
+    misses: int = 0
+    hit_bytes: int = 0
+    miss_bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ArtifactCache:
+    """Size-bounded, least-recently-used cache of downloaded archives."""
+
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = Path(root)
+        self.max_bytes = max_bytes
+        self.objects = self.root / OBJECTS_DIR
+
+    @contextmanager
+    def _locked_index(self) -> Iterator[dict]:
+        """Yield the index for modification; it is written back on exit."""
+        self.objects.mkdir(parents=True, exist_ok=True)
+        with open(self.root / LOCK_FILE, "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                index = json.loads((self.root / INDEX_FILE).read_text())
+            except (OSError, ValueError):
+                index = {}
+            index.setdefault("entries", {})
+            index.setdefault("stats", {})
+            yield index
+            tmp = self.root / f".{INDEX_FILE}.{os.getpid()}.tmp"
+            tmp.write_text(json.dumps(index, indent=1))
+            os.replace(tmp, self.root / INDEX_FILE)
+
+    def _object(self, digest: str) -> Path:
+        return self.objects / digest
+
+    @staticmethod
+    def _count(index: dict, outcome: str, size: int, lookups: int = 1) -> None:
+        """Add to the "hits"/"misses" and "hit_bytes"/"miss_bytes" counters."""
+        stats = index["stats"]
+        counter = {"hit": "hits", "miss": "misses"}[outcome]
+        stats[counter] = stats.get(counter, 0) + lookups
+        stats[f"{outcome}_bytes"] = stats.get(f"{outcome}_bytes", 0) + size
+
+    @staticmethod
+    def _place(source: Path, dest: Path) -> None:
+        """Hard-link source to dest, copying when they are on different filesystems."""
+        dest.unlink(missing_ok=True)
+        try:
+            os.link(source, dest)
+        except OSError:
+            shutil.copyfile(source, dest)
+
+    def lookup(self, remote_path: str, digest: str, dest: Path) -> bool:
+        """Place a cached copy of the archive at dest; False (counted as a miss) if absent."""
+        with self._locked_index() as index:
+            entry = index["entries"].get(digest)
+            obj = self._object(digest)
+            if entry is None or not obj.is_file():
+                index["entries"].pop(digest, None)
+                self._count(index, "miss", 0)
+                return False
+            self._place(obj, dest)
+            entry["last_used"] = time.time()
+            if remote_path not in entry["remotes"]:
+                entry["remotes"].append(remote_path)
+            self._count(index, "hit", entry["size"])
+        return True
+
+    def fetch(self, remote_path: str, digest: str, dest: Path) -> bool:
+        """Put the archive at dest, from the cache or else downloaded through it.
+
+        Returns True on a cache hit. A download whose checksum does not
+        match is not cached and raises CalledProcessError like a failed
+        rclone call.
+        """
+        if self.lookup(remote_path, digest, dest):
+            return True
+        part = self.objects / f".{digest}.{os.getpid()}.part"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        try:
+            subprocess.run(["rclone", "copyto", remote_path, str(part)], check=True)
+            if file_sha256(part) != digest:
+                raise subprocess.CalledProcessError(1, f"rclone copyto {remote_path} (checksum mismatch)")
+            size = part.stat().st_size
+            self._place(part, dest)
+            with self._locked_index() as index:
+                self._count(index, "miss", size, lookups=0)
+                if size <= self.max_bytes:
+                    self._evict(index, self.max_bytes - size)
+                    os.replace(part, self._object(digest))
+                    index["entries"][digest] = {
+                        "remotes": [remote_path], "size": size, "last_used": time.time(),
+                    }
+        finally:
+            part.unlink(missing_ok=True)
+        return False
+
+    def _evict(self, index: dict, budget: int) -> None:
+        """Drop least recently used objects until the cache holds at most budget bytes."""
+        entries = index["entries"]
+        total = sum(e["size"] for e in entries.values())
+        for digest, entry in sorted(entries.items(), key=lambda item: item[1]["last_used"]):
+            if total <= budget:
+                break
+            self._object(digest).unlink(missing_ok=True)
+            del entries[digest]
+            total -= entry["size"]
+
+    def stats(self) -> CacheStats:
+        try:
+            index = json.loads((self.root / INDEX_FILE).read_text())
+        except (OSError, ValueError):
+            return CacheStats()
+        entries = index.get("entries", {})
+        stats = index.get("stats", {})
+        return CacheStats(
+            objects=len(entries),
+            size=sum(e["size"] for e in entries.values()),
+            hits=stats.get("hits", 0),
+            misses=stats.get("misses", 0),
+            hit_bytes=stats.get("hit_bytes", 0),
+            miss_bytes=stats.get("miss_bytes", 0),
+        )
+
+    def purge(self) -> int:
+        """Remove every cached object and reset the counters; returns the bytes freed."""
+        with self._locked_index() as index:
+            freed = sum(e["size"] for e in index["entries"].values())
+            shutil.rmtree(self.objects, ignore_errors=True)
+            self.objects.mkdir(parents=True)
+            index["entries"] = {}
+            index["stats"] = {}
+        return freed
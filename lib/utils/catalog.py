@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Snapshot catalog kept at the root of each instance remote.
+
+catalog.json holds every snapshot's parsed manifest plus whether it carries
+docker-images.txt, so listing snapshots costs one `rclone cat` and one
+directory listing instead of two rclone calls per snapshot. backup.py
+records each snapshot after uploading it; readers compare the catalog with
+the listing and fetch only the manifests it is missing (all of them in one
+`rclone copy` when the catalog does not exist yet), then write the repaired
+catalog back. Writes go to a temporary object that is then moved over
+catalog.json, so readers never see a half-written catalog.
+
+Archive snapshots live in <remote>/archive and are keyed "archive/<name>".
+"""
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+
+from lib.utils.common import is_snapshot_name, parse_manifest
+
+
+CATALOG_NAME = "catalog.json"
+CATALOG_VERSION = 1
+ARCHIVE_PREFIX = "archive/"
+
+
+def read_catalog(remote: str) -> dict[str, dict] | None:
+    """Return the catalog as stored (no listing or repair); None if missing or unreadable."""
+    result = subprocess.run(
+        ["rclone", "cat", f"{remote}/{CATALOG_NAME}"], capture_output=True, text=True, check=False
+    )
+    if result.returncode != 0:
+        return None
+    try:
+        data = json.loads(result.stdout)
+    except json.JSONDecodeError:
+        return None
+    if not isinstance(data, dict) or data.get("version") != CATALOG_VERSION:
+        return None
+    return data.get("snapshots", {})
+
+
+def write_catalog(remote: str, snapshots: dict[str, dict]) -> bool:
+    """Replace the remote catalog atomically (upload to a temp name, then move)."""
+    payload = json.dumps(
+        {
+            "version": CATALOG_VERSION,
+            "updated": datetime.now(timezone.utc).isoformat(),
+            "snapshots": dict(sorted(snapshots.items())),
+        },
+        indent=1,
+    )
+    tmp = f"{remote}/.{CATALOG_NAME}.{os.getpid()}.tmp"
+    upload = subprocess.run(
+        ["rclone", "rcat", tmp], input=payload, text=True, capture_output=True, check=False
+    )
+    if upload.returncode != 0:
+        return False
+    move = subprocess.run(
+        ["rclone", "moveto", tmp, f"{remote}/{CATALOG_NAME}"], capture_output=True, check=False
+    )
+    if move.returncode != 0:
+        subprocess.run(["rclone", "deletefile", tmp], capture_output=True, check=False)
+        return False
+    return True
+
+
+def list_snapshot_names(remote: str) -> set[str] | None:
+    """Snapshot directories under remote and remote/archive, from one listing.
+
+    Returns None when the remote could not be listed (as opposed to empty).
+    """
+    result = subprocess.run(
+        ["rclone", "lsjson", remote, "-R", "--dirs-only", "--max-depth", "2", "--no-modtime"],
+        capture_output=True, text=True, check=False
+    )
+    if result.returncode == 3:  # directory not found: no snapshots yet
+        return set()
+    if result.returncode != 0:
+        return None
+    names = set()
+    for item in json.loads(result.stdout or "[]"):
+        parts = item["Path"].split("/")
+        if len(parts) == 1 and is_snapshot_name(parts[0]):
+            names.add(parts[0])
+        elif len(parts) == 2 and parts[0] == "archive" and is_snapshot_name(parts[1]):
+            names.add(ARCHIVE_PREFIX + parts[1])
+    return names
+
+
+def catalog_entry(manifest: dict[str, str], has_docker_versions: bool) -> dict:
+    return {"manifest": manifest, "has_docker_versions": has_docker_versions}
+
+
+def _fetch_entries(remote: str, names: set[str]) -> dict[str, dict]:
+    """Download manifest.yaml and docker-images.txt of the given snapshots in one call."""
+    with tempfile.TemporaryDirectory(prefix="paperless-catalog.") as tmp:
+        local = Path(tmp)
+        listing = local / "files-from.txt"
+        listing.write_text("".join(
+            f"{name}/manifest.yaml\n{name}/docker-images.txt\n" for name in sorted(names)
+        ))
+        subprocess.run(
+            ["rclone", "copy", remote, str(local / "data"), "--files-from", listing.name,
+             "--transfers", "16", "--checkers", "16"],
+            cwd=tmp, capture_output=True, check=False
+        )
+        entries = {}
+        for name in names:
+            manifest = local / "data" / name / "manifest.yaml"
+            if not manifest.exists():
+                continue  # upload still in progress or broken snapshot; retried next time
+            entries[name] = catalog_entry(
+                parse_manifest(manifest.read_text()),
+                (local / "data" / name / "docker-images.txt").exists(),
+            )
+        return entries
+
+
+def load_catalog(remote: str) -> dict[str, dict]:
+    """Return {snapshot name: entry} for remote, repairing a missing or stale catalog."""
+    snapshots = read_catalog(remote)
+    names = list_snapshot_names(remote)
+    if names is None:
+        return snapshots or {}
+    current = {name: entry for name, entry in (snapshots or {}).items() if name in names}
+    missing = names - current.keys()
+    if missing:
+        current.update(_fetch_entries(remote, missing))
+    if snapshots is None or current.keys() != snapshots.keys():
+        write_catalog(remote, current)
+    return current
+
+
+def record_snapshot(remote: str, name: str, manifest: dict[str, str], has_docker_versions: bool) -> bool:
+    """Add or replace one snapshot's entry after it has been uploaded."""
+    snapshots = read_catalog(remote)
+    if snapshots is None:
+        snapshots = load_catalog(remote)
+    snapshots[name] = catalog_entry(manifest, has_docker_versions)
+    return write_catalog(remote, snapshots)
+
+
+def forget_snapshots(remote: str, names: list[str]) -> bool:
+    """Drop entries for deleted snapshots (a later load would also notice)."""
+    snapshots = read_catalog(remote)
+    if snapshots is None:
+        return False
+    for name in names:
+        snapshots.pop(name, None)
+    return write_catalog(remote, snapshots)
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Content-addressed chunk store for deduplicated snapshots.
+
+Files are split into fixed-size chunks named by their sha256 and uploaded
+once to <instance remote>/chunks/<aa>/<sha256>. A snapshot then only holds
+one index per directory (<name>.chunks.gz): gzip'd JSON lines describing
+every directory, symlink and file with its chunk references. Unchanged
+documents cost no upload, and every indexed snapshot can be rebuilt on its
+own without walking an incremental chain.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+from typing import Iterator
+
+from lib.ui import say, ok, warn
+
+
+CHUNK_SIZE = 4 * 1024 * 1024
+CHUNKS_DIR = "chunks"
+INDEX_SUFFIX = ".chunks.gz"
+BATCH_BYTES = 256 * 1024 * 1024  # Staged/downloaded chunk bytes per rclone call
+
+
+def chunk_path(digest: str) -> str:
+    """Relative path of a chunk inside the store."""
+    return f"{digest[:2]}/{digest}"
+
+
+def index_name(name: str) -> str:
+    return f"{name}{INDEX_SUFFIX}"
+
+
+def list_remote_chunks(store: str) -> set[str]:
+    """Return the digests already present in the store (one recursive listing)."""
+    result = subprocess.run(
+        ["rclone", "lsf", "-R", "--files-only", "--fast-list", store],
+        capture_output=True, text=True, check=False
+    )
+    return {Path(line).name for line in result.stdout.splitlines() if line.strip()}
+
+
+def read_index(path: Path) -> Iterator[dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        for line in fh:
+            if line.strip():
+                yield json.loads(line)
+
+
+def fetch_index(remote_file: str) -> dict[str, dict]:
+    """Load a remote index keyed by path ({} if it does not exist)."""
+    result = subprocess.run(["rclone", "cat", remote_file], capture_output=True, check=False)
+    if result.returncode != 0 or not result.stdout:
+        return {}
+    entries = {}
+    for line in gzip.decompress(result.stdout).decode("utf-8").splitlines():
+        if line.strip():
+            entry = json.loads(line)
+            entries[entry["path"]] = entry
+    return entries
+
+
+class ChunkWriter:
+    """Stages chunks missing from the store and uploads them in batches.
+
+    Shared by the concurrent per-directory phases, so the known-digest set
+    and the staging directory are guarded by a lock.
+    """
+
+    def __init__(self, store: str, staging: Path, known: set[str]):
+        self.store = store
+        self.staging = staging
+        self.known = known
+        self.staged_bytes = 0
+        self.uploaded_bytes = 0
+        self.uploaded_chunks = 0
+        self._lock = threading.Lock()
+
+    def add(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        with self._lock:
+            if digest in self.known:
+                return digest
+            target = self.staging / chunk_path(digest)
+            target.parent.mkdir(parents=True, exist_ok=True)
+            target.write_bytes(data)
+            self.known.add(digest)
+            self.staged_bytes += len(data)
+            self.uploaded_chunks += 1
+            if self.staged_bytes >= BATCH_BYTES:
+                self._flush_locked()
+        return digest
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        if not self.staged_bytes:
+            return
+        subprocess.run(
+            ["rclone", "move", str(self.staging), self.store,
+             "--transfers", "8", "--delete-empty-src-dirs"],
+            check=True,
+        )
+        self.uploaded_bytes += self.staged_bytes
+        self.staged_bytes = 0
+
+
+def index_tree(src: Path, out: Path, writer: ChunkWriter, previous: dict[str, dict]) -> dict:
+    """Chunk every file under src and write its index to out.
+
+    Files whose size and mtime match the previous snapshot's index reuse
+    its chunk list and whole-file sha256 without being read again.
+    """
+    files = reused = total_bytes = 0
+    with gzip.open(out, "wt", encoding="utf-8") as fh:
+        for root, dirs, names in os.walk(src):
+            dirs.sort()
+            root_path = Path(root)
+            rel_root = root_path.relative_to(src.parent)
+            fh.write(json.dumps(_entry(root_path, str(rel_root), "dir")) + "\n")
+            for name in sorted(names) + [d for d in dirs if (root_path / d).is_symlink()]:
+                path = root_path / name
+                rel = str(rel_root / name)
+                if path.is_symlink():
+                    entry = _entry(path, rel, "link")
+                    entry["target"] = os.readlink(path)
+                elif path.is_file():
+                    entry = _entry(path, rel, "file")
+                    old = previous.get(rel)
+                    if (old and old.get("type") == "file" and old["size"] == entry["size"]
+                            and old["mtime_ns"] == entry["mtime_ns"] and "sha256" in old):
+                        entry["chunks"] = old["chunks"]
+                        entry["sha256"] = old["sha256"]
+                        reused += 1
+                    else:
+                        entry["chunks"], entry["sha256"] = _chunk_file(path, writer)
+                    files += 1
+                    total_bytes += entry["size"]
+                else:
+                    continue  # sockets, fifos and devices are not backed up
+                fh.write(json.dumps(entry) + "\n")
+    return {"files": files, "reused": reused, "bytes": total_bytes}
+
+
+def _entry(path: Path, rel: str, kind: str) -> dict:
+    st = path.lstat()
+    return {
+        "path": rel, "type": kind, "mode": st.st_mode & 0o7777,
+        "uid": st.st_uid, "gid": st.st_gid,
+        "mtime_ns": st.st_mtime_ns, "size": st.st_size if kind == "file" else 0,
+    }
+
+
+def _chunk_file(path: Path, writer: ChunkWriter) -> tuple[list[str], str]:
+    """Store path's chunks; returns the chunk list and the whole-file sha256."""
+    chunks = []
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        while True:
+            data = fh.read(CHUNK_SIZE)
+            if not data:
+                break
+            digest.update(data)
+            chunks.append(writer.add(data))
+    return chunks, digest.hexdigest()
+
+
+def restore_index(index: Path, store: str, dest: Path) -> int:
+    """Rebuild the tree described by index under dest, fetching chunks in batches.
+
+    Returns the number of files restored. Chunks are verified against their
+    sha256 before being written.
+    """
+    dirs: list[dict] = []
+    batch: list[dict] = []
+    batch_bytes = restored = 0
+    with tempfile.TemporaryDirectory(prefix="paperless-chunks.") as tmp:
+        cache = Path(tmp)
+        for entry in read_index(index):
+            target = dest / entry["path"]
+            if entry["type"] == "dir":
+                target.mkdir(parents=True, exist_ok=True)
+                dirs.append(entry)
+            elif entry["type"] == "link":
+                if target.is_symlink() or target.exists():
+                    target.unlink()
+                os.symlink(entry["target"], target)
+                os.lchown(target, entry["uid"], entry["gid"])
+            else:
+                batch.append(entry)
+                batch_bytes += entry["size"]
+                if batch_bytes >= BATCH_BYTES:
+                    restored += _restore_batch(batch, store, cache, dest)
+                    batch, batch_bytes = [], 0
+        restored += _restore_batch(batch, store, cache, dest)
+    # Directory metadata last, so writing files does not bump the mtimes again
+    for entry in reversed(dirs):
+        _apply_metadata(dest / entry["path"], entry)
+    return restored
+
+
+def _restore_batch(batch: list[dict], store: str, cache: Path, dest: Path) -> int:
+    if not batch:
+        return 0
+    digests = {d for entry in batch for d in entry["chunks"]}
+    if digests:
+        listing = cache / "files-from.txt"
+        listing.write_text("".join(f"{chunk_path(d)}\n" for d in sorted(digests)))
+        subprocess.run(
+            ["rclone", "copy", store, str(cache / "data"), "--files-from", str(listing),
+             "--transfers", "8"],
+            check=True,
+        )
+    for entry in batch:
+        target = dest / entry["path"]
+        # Written beside the target and renamed over it: an existing file may
+        # be hard-linked elsewhere (see restore_media) and must not change
+        part = target.with_name(f".{target.name}.part")
+        with open(part, "wb") as out:
+            for digest in entry["chunks"]:
+                data = (cache / "data" / chunk_path(digest)).read_bytes()
+                if hashlib.sha256(data).hexdigest() != digest:
+                    raise RuntimeError(f"Chunk {digest} is corrupt (needed by {entry['path']})")
+                out.write(data)
+        _apply_metadata(part, entry)
+        os.replace(part, target)
+    shutil.rmtree(cache / "data", ignore_errors=True)
+    return len(batch)
+
+
+def _apply_metadata(path: Path, entry: dict) -> None:
+    os.chown(path, entry["uid"], entry["gid"])
+    os.chmod(path, entry["mode"])
+    os.utime(path, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+
+
+def referenced_chunks(indexes: list[Path]) -> set[str]:
+    """Collect every digest referenced by the given index files."""
+    digests: set[str] = set()
+    for index in indexes:
+        for entry in read_index(index):
+            digests.update(entry.get("chunks", ()))
+    return digests
+
+
+def collect_garbage(store: str, snapshot_roots: list[str], min_age: str = "24h") -> int:
+    """Delete chunks no remaining snapshot references.
+
+    Chunks younger than min_age are kept so a backup that is still uploading
+    (and has not written its index yet) never loses data.
+    """
+    stored = list_remote_chunks(store)
+    if not stored:
+        return 0
+    with tempfile.TemporaryDirectory(prefix="paperless-chunk-gc.") as tmp:
+        local = Path(tmp)
+        for idx, root in enumerate(snapshot_roots):
+            result = subprocess.run(
+                ["rclone", "copy", root, str(local / str(idx)), "--include", f"/*/*{INDEX_SUFFIX}"],
+                capture_output=True, check=False
+            )
+            # Exit code 3 is rclone's "directory not found": no snapshots there yet
+            if result.returncode not in (0, 3):
+                warn(f"Could not read chunk indexes from {root}; skipping chunk cleanup")
+                return 0
+        keep = referenced_chunks(sorted(local.rglob(f"*{INDEX_SUFFIX}")))
+        garbage = sorted(stored - keep)
+        if not garbage:
+            return 0
+        say(f"  Removing {len(garbage)} unreferenced chunk(s)...")
+        listing = local / "garbage.txt"
+        listing.write_text("".join(f"{chunk_path(d)}\n" for d in garbage))
+        subprocess.run(
+            ["rclone", "delete", store, "--files-from", str(listing), "--min-age", min_age],
+            check=False, capture_output=True
+        )
+        ok("  Chunk store cleanup complete")
+    return len(garbage)
@@ -6,10 +6,12 @@ This module consolidates common functionality used across the codebase:
 - Terminal colors and output formatting (re-exported from lib.ui)
 - Environment file loading
 - Docker compose command building
+- Snapshot names and manifest parsing
 """
 from __future__ import annotations
 
 import os
+import re
 from pathlib import Path
 from typing import Optional
 
@@ -23,7 +25,8 @@ from lib.ui import (
 
 __all__ = [
     'Colors', 'colorize', 'say', 'log', 'ok', 'warn', 'error', 'die',
-    'load_env', 'load_env_to_environ', 'docker_compose_cmd'
+    'load_env', 'load_env_to_environ', 'docker_compose_cmd', 'parse_manifest',
+    'is_snapshot_name'
 ]
 
 
@@ -89,3 +92,34 @@ def docker_compose_cmd(
     cmd.extend(args)
     return cmd
 
+
+
+# ─── Snapshot Manifests ───────────────────────────────────────────────────────
+
+_SNAPSHOT_NAME = re.compile(r"^\d{4}-\d{2}-\d{2}_\d{2}-\d{2}-\d{2}$")
+
+
+def is_snapshot_name(name: str) -> bool:
+    """Check whether a remote folder name is a snapshot (YYYY-MM-DD_HH-MM-SS).
+    
+    Instance remotes also hold non-snapshot folders such as archive/ and
+    chunks/, which must never be treated as snapshots.
+    """
+    return bool(_SNAPSHOT_NAME.match(name.rstrip("/")))
+
+
+def parse_manifest(text: str) -> dict[str, str]:
+    """Parse a snapshot manifest.yaml (flat "key: value" lines).
+    
+    Args:
+        text: Manifest file contents
+        
+    Returns:
+        Dictionary of keys to stripped string values
+    """
+    manifest: dict[str, str] = {}
+    for line in text.splitlines():
+        if ":" in line:
+            key, value = line.split(":", 1)
+            manifest[key.strip()] = value.strip()
+    return manifest
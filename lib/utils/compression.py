@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Compression codecs for snapshot tarballs and database dumps.
+
+Each codec knows the file extension it produces, the program tar should
+run through --use-compress-program, and standalone compress/decompress
+commands for pipelines such as the streamed pg_dump. The codec used for a
+snapshot is recorded in its manifest.yaml so restore can pick the right
+decompressor; older snapshots without that key are detected by extension.
+"""
+from __future__ import annotations
+
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from lib.ui import warn
+
+
+@dataclass(frozen=True)
+class Codec:
+    """A compression format and the programs that read and write it."""
+    name: str
+    extension: str  # Appended to ".tar" / ".sql" ("" for uncompressed)
+    program: Optional[str]  # Value for tar --use-compress-program, None = no compression
+    compress_cmd: tuple[str, ...]  # stdin -> stdout
+    decompress_cmd: tuple[str, ...]  # stdin -> stdout
+
+    def tar_flags(self) -> list[str]:
+        """tar options selecting this codec (tar adds -d itself when extracting)."""
+        return [f"--use-compress-program={self.program}"] if self.program else []
+
+    def binary(self) -> Optional[str]:
+        return self.program.split()[0] if self.program else None
+
+    def available(self) -> bool:
+        return self.program is None or shutil.which(self.binary()) is not None
+
+
+CODECS: dict[str, Codec] = {
+    "gzip": Codec("gzip", ".gz", "gzip", ("gzip", "-c"), ("gzip", "-dc")),
+    "pigz": Codec("pigz", ".gz", "pigz", ("pigz", "-c"), ("pigz", "-dc")),
+    "zstd": Codec("zstd", ".zst", "zstd -T0", ("zstd", "-T0", "-q", "-c"), ("zstd", "-dc", "-q")),
+    "none": Codec("none", "", None, ("cat",), ("cat",)),
+}
+
+DEFAULT_CODEC = "gzip"
+
+
+def resolve_codec(name: str) -> Codec:
+    """Return the codec to write with, falling back to gzip when unusable."""
+    codec = CODECS.get((name or DEFAULT_CODEC).strip().lower())
+    if codec is None:
+        warn(f"Unknown compression '{name}', using {DEFAULT_CODEC}")
+        return CODECS[DEFAULT_CODEC]
+    if not codec.available():
+        warn(f"{codec.binary()} not installed, using {DEFAULT_CODEC} compression")
+        return CODECS[DEFAULT_CODEC]
+    return codec
+
+
+def codec_for_file(path: Path, hint: str = "") -> Codec:
+    """Pick the decompressor for an existing tarball or dump.
+
+    hint is the manifest's compression value. It is only trusted when it
+    produces the file's extension, so a mixed or legacy snapshot (plain
+    .tar.gz without a compression key) still restores correctly. pigz
+    falls back to gzip when it is not installed on the restoring host.
+    """
+    suffix = path.suffix if path.suffix in (".gz", ".zst") else ""
+    codec = CODECS.get(hint)
+    if codec is None or codec.extension != suffix:
+        codec = next(c for c in CODECS.values() if c.extension == suffix)
+    if codec.name == "pigz" and not codec.available():
+        codec = CODECS["gzip"]
+    return codec
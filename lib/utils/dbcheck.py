@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Database dump verification without replaying the dump.
+
+A dump is checked structurally: a plain SQL dump must end with pg_dump's
+completion marker, a directory-format dump must have a readable table of
+contents (`pg_restore --list`) with a data file for every TABLE DATA entry.
+Both yield per-table row counts (rows between COPY and "\\.") whose sorted
+listing is hashed into a checksum stored in the manifest. A full replay into
+a scratch container stays available as an opt-in, and can compare the
+restored row counts against the same listing.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import subprocess
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import BinaryIO
+
+
+COMPLETE_MARKER = b"-- PostgreSQL database dump complete"
+COPY_END = b"\\."
+
+
+@dataclass
+class DumpSummary:
+    """Tables and row counts found in a dump."""
+    tables: dict[str, int] = field(default_factory=dict)  # "schema.table" -> rows
+    complete: bool = False
+    problems: list[str] = field(default_factory=list)
+
+    @property
+    def rows(self) -> int:
+        return sum(self.tables.values())
+
+    def checksum(self) -> str:
+        listing = "".join(f"{name}\t{rows}\n" for name, rows in sorted(self.tables.items()))
+        return hashlib.sha256(listing.encode("utf-8")).hexdigest()
+
+    def manifest_lines(self) -> list[str]:
+        return [
+            f"db_tables: {len(self.tables)}",
+            f"db_rows: {self.rows}",
+            f"db_checksum: {self.checksum()}",
+        ]
+
+
+def _copy_table(line: bytes) -> str:
+    """Table name of a `COPY schema.table (cols) FROM stdin;` line."""
+    target = line[5:].decode("utf-8", "replace")
+    return target.split(" (", 1)[0].split(" FROM stdin", 1)[0].strip()
+
+
+def summarize_plain_dump(stream: BinaryIO) -> DumpSummary:
+    """Count COPY rows per table in a plain SQL dump read from stream."""
+    summary = DumpSummary()
+    table = None
+    rows = 0
+    marker = False
+    for line in stream:
+        if table is not None:
+            if line.rstrip(b"\r\n") == COPY_END:
+                summary.tables[table] = summary.tables.get(table, 0) + rows
+                table = None
+            else:
+                rows += 1
+            continue
+        if line.startswith(b"COPY ") and line.rstrip().endswith(b"FROM stdin;"):
+            table, rows = _copy_table(line), 0
+        elif line.startswith(COMPLETE_MARKER):
+            marker = True
+    if table is not None:
+        summary.problems.append(f"COPY data for {table} is truncated")
+    summary.complete = marker and table is None
+    if not summary.complete and table is None:
+        summary.problems.append("dump does not end with pg_dump's completion marker")
+    return summary
+
+
+def parse_toc(listing: str) -> dict[str, str]:
+    """Map dump IDs of TABLE DATA entries to "schema.table" from `pg_restore --list`."""
+    entries = {}
+    for line in listing.splitlines():
+        if line.startswith(";") or " TABLE DATA " not in line:
+            continue
+        dump_id = line.split(";", 1)[0].strip()
+        schema, table = line.split(" TABLE DATA ", 1)[1].split()[:2]
+        entries[dump_id] = f"{schema}.{table}"
+    return entries
+
+
+def summarize_directory_dump(dump_dir: Path, listing: str) -> DumpSummary:
+    """Check every TABLE DATA entry of a `pg_dump -Fd` dump has its data file and count its rows."""
+    summary = DumpSummary()
+    toc = parse_toc(listing)
+    if not toc and not (dump_dir / "toc.dat").exists():
+        summary.problems.append("toc.dat missing or unreadable")
+        return summary
+    for dump_id, table in toc.items():
+        plain, packed = dump_dir / f"{dump_id}.dat", dump_dir / f"{dump_id}.dat.gz"
+        if not plain.exists() and not packed.exists():
+            summary.problems.append(f"data file for {table} ({dump_id}.dat) is missing")
+            continue
+        try:
+            with (gzip.open(packed, "rb") if packed.exists() else open(plain, "rb")) as fh:
+                rows = 0
+                for line in fh:
+                    if line.rstrip(b"\r\n") == COPY_END:
+                        break
+                    rows += 1
+        except (OSError, EOFError) as e:
+            summary.problems.append(f"data file for {table} is corrupt ({e})")
+            continue
+        summary.tables[table] = rows
+    summary.complete = not summary.problems
+    return summary
+
+
+def wait_for_postgres(container: str, user: str = "postgres", timeout: float = 120.0) -> bool:
+    """Poll pg_isready inside container until the server accepts connections.
+
+    Checks over TCP: the image's entrypoint runs a socket-only temporary
+    server while initialising, which must not count as ready.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if subprocess.run(
+            ["docker", "exec", container, "pg_isready", "-q", "-h", "127.0.0.1", "-U", user],
+            check=False, capture_output=True
+        ).returncode == 0:
+            return True
+        time.sleep(0.5)
+    return False
+
+
+def count_rows_sql(tables: list[str]) -> str:
+    """One query returning "table<TAB>rows" for every given schema.table."""
+    parts = []
+    for name in sorted(tables):
+        schema, table = (part.strip('"') for part in name.split(".", 1))
+        literal = name.replace("'", "''")
+        parts.append(f'SELECT \'{literal}\', count(*) FROM "{schema}"."{table}"')
+    return " UNION ALL ".join(parts) + ";"
+
+
+def parse_row_counts(output: str) -> dict[str, int]:
+    counts = {}
+    for line in output.splitlines():
+        name, _, rows = line.rpartition("\t")
+        if name:
+            counts[name] = int(rows)
+    return counts
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Per-file content index written alongside every snapshot archive.
+
+Each tarball <base>.tar.* gets a <base>.index.gz: gzip'd, tab-separated
+lines of path, size, mtime and sha256, sorted by path. For incremental
+tarballs the index lists the files that tarball actually contains. The
+index is built from the uncompressed tar stream while it is being written,
+so it costs no second read of the data, and it can be streamed with
+`rclone cat ... | gunzip` to check, diff or locate files without touching
+the archive itself.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import tarfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator
+
+from lib.ui import warn
+
+
+INDEX_SUFFIX = ".index.gz"
+HEADER = "#paperless-file-index v1\tpath\tsize\tmtime\tsha256"
+COPY_SIZE = 1024 * 1024
+
+
+@dataclass(frozen=True)
+class FileEntry:
+    """One regular file recorded in a snapshot archive."""
+    path: str
+    size: int
+    mtime: int
+    sha256: str
+
+
+def file_index_name(base: str) -> str:
+    """Index filename for an archive base name such as "media" or "media-store"."""
+    return f"{base}{INDEX_SUFFIX}"
+
+
+def _escape(path: str) -> str:
+    return path.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def _unescape(path: str) -> str:
+    out, chars = [], iter(path)
+    for ch in chars:
+        if ch == "\\":
+            nxt = next(chars, "")
+            out.append({"t": "\t", "n": "\n"}.get(nxt, nxt))
+        else:
+            out.append(ch)
+    return "".join(out)
+
+
+def write_index(entries: Iterable[FileEntry], out: Path) -> int:
+    """Write entries sorted by path; returns the number written."""
+    rows = sorted(entries, key=lambda e: e.path)
+    with gzip.open(out, "wt", encoding="utf-8") as fh:
+        fh.write(HEADER + "\n")
+        for entry in rows:
+            fh.write(f"{_escape(entry.path)}\t{entry.size}\t{entry.mtime}\t{entry.sha256}\n")
+    return len(rows)
+
+
+def parse_index(lines: Iterable[str]) -> Iterator[FileEntry]:
+    for line in lines:
+        line = line.rstrip("\n")
+        if not line or line.startswith("#"):
+            continue
+        path, size, mtime, digest = line.rsplit("\t", 3)
+        yield FileEntry(_unescape(path), int(size), int(mtime), digest)
+
+
+def read_index(path: Path) -> Iterator[FileEntry]:
+    with gzip.open(path, "rt", encoding="utf-8") as fh:
+        yield from parse_index(fh)
+
+
+class _GnuTarInfo(tarfile.TarInfo):
+    """TarInfo that understands GNU incremental headers.
+
+    GNU tar stores atime/ctime where ustar keeps the name prefix, which
+    tarfile would otherwise glue onto every member name.
+    """
+
+    @classmethod
+    def frombuf(cls, buf, encoding, errors):
+        obj = super().frombuf(buf, encoding, errors)
+        if buf[257:265] == tarfile.GNU_MAGIC:
+            prefix = tarfile.nts(buf[345:500], encoding, errors)
+            if prefix and obj.name.startswith(prefix + "/"):
+                obj.name = obj.name[len(prefix) + 1:]
+        return obj
+
+
+class _Tee:
+    """Read-only file object that forwards everything it reads to a sink."""
+
+    def __init__(self, source: BinaryIO, sink: BinaryIO):
+        self.source = source
+        self.sink = sink
+        self.total = 0
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.source.read(size)
+        if data:
+            self.sink.write(data)
+            self.total += len(data)
+        return data
+
+    def drain(self) -> None:
+        while self.read(COPY_SIZE):
+            pass
+
+
+def index_tar_stream(source: BinaryIO, sink: BinaryIO) -> tuple[list[FileEntry] | None, int, int]:
+    """Copy an uncompressed tar stream from source to sink, indexing it on the way.
+
+    Returns (entries, tar members, bytes copied). Entries is None and the
+    member count 0 when the stream could not be parsed; the copy itself
+    always completes.
+    """
+    tee = _Tee(source, sink)
+    entries: list[FileEntry] | None = []
+    members = 0
+    try:
+        with tarfile.open(fileobj=tee, mode="r|", tarinfo=_GnuTarInfo) as archive:
+            for member in archive:
+                members += 1
+                if not member.isreg():
+                    continue
+                digest = hashlib.sha256()
+                fh = archive.extractfile(member)
+                while chunk := fh.read(COPY_SIZE):
+                    digest.update(chunk)
+                entries.append(FileEntry(member.name, member.size, int(member.mtime), digest.hexdigest()))
+    except (tarfile.TarError, EOFError, ValueError) as e:
+        warn(f"Could not index tar stream ({e}); archive written without a file index")
+        entries, members = None, 0
+    tee.drain()  # end-of-archive padding the parser stops short of
+    return entries, members, tee.total
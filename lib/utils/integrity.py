@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+Archive integrity records computed while snapshots are written.
+
+Every tarball's sha256, size and tar entry count are measured on the fly
+as the archive is produced and stored in manifest.yaml as
+"archive.<file>: <sha256> <size> <entries>". Verifying a snapshot later is
+then a hash comparison: against the local file, or against the uploaded
+object with `rclone hashsum` (falling back to sizes on remotes that cannot
+report sha256) instead of decompressing and re-reading every archive.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO
+
+from lib.ui import warn
+
+
+MANIFEST_PREFIX = "archive."
+COPY_SIZE = 1024 * 1024
+
+
+@dataclass
+class ArchiveDigest:
+    """Integrity record for one archive file."""
+    sha256: str
+    size: int
+    entries: int
+
+    def manifest_line(self, filename: str) -> str:
+        return f"{MANIFEST_PREFIX}{filename}: {self.sha256} {self.size} {self.entries}"
+
+
+class HashingWriter:
+    """Write-through file object that hashes and counts what passes through."""
+
+    def __init__(self, out: BinaryIO):
+        self.out = out
+        self.digest = hashlib.sha256()
+        self.size = 0
+
+    def write(self, data: bytes) -> int:
+        self.digest.update(data)
+        self.size += len(data)
+        return self.out.write(data)
+
+    def copy_from(self, source: BinaryIO) -> None:
+        while data := source.read(COPY_SIZE):
+            self.write(data)
+
+    def hexdigest(self) -> str:
+        return self.digest.hexdigest()
+
+
+def archive_digests(manifest: dict[str, str]) -> dict[str, ArchiveDigest]:
+    """Return the integrity records of a parsed manifest, keyed by filename."""
+    digests = {}
+    for key, value in manifest.items():
+        if not key.startswith(MANIFEST_PREFIX):
+            continue
+        try:
+            sha256, size, entries = value.split()
+            digests[key[len(MANIFEST_PREFIX):]] = ArchiveDigest(sha256, int(size), int(entries))
+        except ValueError:
+            warn(f"Ignoring malformed manifest entry {key}")
+    return digests
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        while data := fh.read(COPY_SIZE):
+            digest.update(data)
+    return digest.hexdigest()
+
+
+def verify_local(work: Path, digests: dict[str, ArchiveDigest], rehash: bool = False) -> list[str]:
+    """Compare local archives against their records; returns the mismatching filenames.
+
+    By default only sizes are compared, which is enough right after the
+    archive was written and hashed; rehash=True re-reads the compressed files.
+    """
+    bad = []
+    for filename, record in sorted(digests.items()):
+        path = work / filename
+        if not path.exists() or path.stat().st_size != record.size:
+            bad.append(filename)
+        elif rehash and file_sha256(path) != record.sha256:
+            bad.append(filename)
+    return bad
+
+
+def verify_remote(remote_dir: str, digests: dict[str, ArchiveDigest]) -> list[str]:
+    """Compare uploaded archives against their records; returns the mismatching filenames.
+
+    Uses the remote's own sha256 where the backend provides one; objects
+    without a server-side sha256 are checked by size.
+    """
+    if not digests:
+        return []
+    result = subprocess.run(
+        ["rclone", "hashsum", "sha256", remote_dir, "--max-depth", "1"],
+        capture_output=True, text=True, check=False
+    )
+    remote_hashes = {}
+    for line in result.stdout.splitlines():
+        parts = line.split(None, 1)
+        if len(parts) == 2:
+            remote_hashes[parts[1].strip()] = parts[0]
+
+    sizes = {}
+    missing_hash = [f for f in digests if len(remote_hashes.get(f, "")) != 64]
+    if missing_hash:
+        listing = subprocess.run(
+            ["rclone", "lsjson", remote_dir, "--files-only", "--max-depth", "1"],
+            capture_output=True, text=True, check=False
+        )
+        if listing.returncode == 0 and listing.stdout.strip():
+            sizes = {item["Path"]: item["Size"] for item in json.loads(listing.stdout)}
+
+    bad = []
+    for filename, record in sorted(digests.items()):
+        remote_hash = remote_hashes.get(filename, "")
+        if len(remote_hash) == 64:
+            if remote_hash.lower() != record.sha256:
+                bad.append(filename)
+        elif sizes.get(filename) != record.size:
+            bad.append(filename)
+    return bad
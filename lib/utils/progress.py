@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Progress of long restores: throughput, ETA and a pollable progress file.
+
+A Progress counts bytes done against an expected total. Throughput is
+measured over the last RATE_WINDOW seconds and the ETA derived from it. A
+status line (chain member, bytes, rate, ETA) is printed every
+PRINT_INTERVAL seconds, and the same state is kept as JSON in a file that
+other tools can poll. The file is replaced atomically at most every
+WRITE_INTERVAL seconds.
+
+Bytes are fed in by callbacks: run_rclone() parses the stats of
+`rclone --use-json-log`, and relay() counts what it pipes into tar or psql.
+"""
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import IO, Callable
+
+from lib.utils.common import say
+
+
+COPY_SIZE = 1024 * 1024
+RATE_WINDOW = 30.0
+WRITE_INTERVAL = 2.0
+PRINT_INTERVAL = 15.0
+RCLONE_STATS_INTERVAL = "2s"
+
+
+def format_bytes(n: float) -> str:
+    if n >= 1024 ** 3:
+        return f"{n / 1024 ** 3:.2f} GiB"
+    return f"{n / 1024 ** 2:.1f} MiB"
+
+
+def format_eta(seconds: float | None) -> str:
+    if seconds is None:
+        return "--:--"
+    minutes, secs = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}:{minutes:02d}:{secs:02d}"
+
+
+class Progress:
+    """Bytes done of a multi-snapshot transfer, echoed to the terminal and kept in path (JSON)."""
+
+    def __init__(self, path: Path | None, chain: list[str], total_bytes: int, label: str = "Restore"):
+        self.path = path
+        self.label = label
+        self.state = {
+            "state": "running", "phase": "", "chain": chain, "snapshot": "", "member": "",
+            "done_bytes": 0, "total_bytes": total_bytes, "percent": 0.0,
+            "bytes_per_sec": 0.0, "eta_seconds": None, "started": time.time(), "updated": 0.0,
+        }
+        self._lock = threading.Lock()
+        self._samples: deque[tuple[float, int]] = deque([(time.monotonic(), 0)])
+        self._last_write = 0.0
+        self._last_print = time.monotonic()
+        self.write()
+
+    def advance(self, nbytes: int) -> None:
+        """Count nbytes more as done (safe to call from several threads)."""
+        with self._lock:
+            self.state["done_bytes"] += nbytes
+            now = time.monotonic()
+            self._samples.append((now, self.state["done_bytes"]))
+            while len(self._samples) > 2 and now - self._samples[1][0] > RATE_WINDOW:
+                self._samples.popleft()
+            if now - self._last_write >= WRITE_INTERVAL:
+                self._write_locked()
+            if now - self._last_print >= PRINT_INTERVAL:
+                self._last_print = now
+                self._refresh_locked()
+                say(self.status_line())
+
+    def update(self, **changes) -> None:
+        """Change state fields (phase, snapshot, state, ...) and write the file now."""
+        with self._lock:
+            self.state.update(changes)
+            self._write_locked()
+
+    def write(self) -> None:
+        with self._lock:
+            self._write_locked()
+
+    def status_line(self) -> str:
+        s = self.state
+        where = f"{s['member']} {s['snapshot']}".strip()
+        phase = f" [{s['phase']}]" if s["phase"] else ""
+        return (
+            f"{self.label} {where}{phase}: {s['percent']:.0f}% "
+            f"({format_bytes(s['done_bytes'])} of {format_bytes(s['total_bytes'])}), "
+            f"{format_bytes(s['bytes_per_sec'])}/s, ETA {format_eta(s['eta_seconds'])}"
+        )
+
+    def _refresh_locked(self) -> None:
+        """Recompute percent, throughput and ETA from the byte counts."""
+        s = self.state
+        total, done = s["total_bytes"], s["done_bytes"]
+        s["percent"] = round(min(100.0, 100.0 * done / total), 1) if total else 0.0
+        (t0, b0), (t1, b1) = self._samples[0], self._samples[-1]
+        s["bytes_per_sec"] = round((b1 - b0) / (t1 - t0), 1) if t1 > t0 else 0.0
+        if s["state"] != "running" or not total:
+            s["eta_seconds"] = None if s["state"] == "running" else 0
+        elif s["bytes_per_sec"] > 0:
+            s["eta_seconds"] = round(max(0, total - done) / s["bytes_per_sec"])
+        s["updated"] = time.time()
+
+    def _write_locked(self) -> None:
+        self._refresh_locked()
+        self._last_write = time.monotonic()
+        if self.path is None:
+            return
+        tmp = self.path.with_name(f"{self.path.name}.tmp")
+        tmp.write_text(json.dumps(self.state, indent=1))
+        os.replace(tmp, self.path)
+
+
+def relay(source: IO[bytes], sink: IO[bytes], progress: Callable[[int], None]) -> None:
+    """Copy source to sink in blocks, reporting each block's size; stops quietly if sink closes."""
+    try:
+        while block := source.read(COPY_SIZE):
+            sink.write(block)
+            progress(len(block))
+    except BrokenPipeError:
+        pass  # the reader exited early; its return code tells why
+    finally:
+        try:
+            sink.close()
+        except BrokenPipeError:
+            pass
+
+
+def run_rclone(args: list[str], progress: Callable[[int], None] | None = None) -> None:
+    """Run `rclone <args>`, feeding transferred bytes to progress; raises CalledProcessError.
+
+    With progress, rclone logs JSON and prints its stats at NOTICE level
+    every RCLONE_STATS_INTERVAL. The cumulative "bytes" of each stats
+    record is turned into increments. Other warnings and errors are
+    passed on to stderr.
+    """
+    if progress is None:
+        subprocess.run(["rclone", *args], check=True)
+        return
+    proc = subprocess.Popen(
+        ["rclone", *args, "--use-json-log", "--stats", RCLONE_STATS_INTERVAL,
+         "--stats-log-level", "NOTICE"],
+        stderr=subprocess.PIPE, text=True,
+    )
+    counted = 0
+    for line in proc.stderr:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            sys.stderr.write(line)
+            continue
+        stats = entry.get("stats")
+        if isinstance(stats, dict):
+            done = int(stats.get("bytes", 0))
+            if done > counted:
+                progress(done - counted)
+                counted = done
+        elif entry.get("level") in ("warning", "error", "critical"):
+            print(f"rclone: {entry.get('msg', '').strip()}", file=sys.stderr)
+    proc.wait()
+    if proc.returncode != 0:
+        raise subprocess.CalledProcessError(proc.returncode, f"rclone {args[0]}")
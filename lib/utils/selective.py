@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Selective restore: finding single files or subtrees in a snapshot chain.
+
+Tar-format snapshots carry a per-file index next to every tarball (see
+file_index.py). The chain is searched newest snapshot first, so each
+requested path resolves to the newest tarball that holds it - including
+files deleted since, which is the usual reason to restore one - and only
+those members are streamed out of their tarballs. Chunk-format snapshots
+describe the whole tree in one index, which is filtered down to the
+requested paths instead.
+
+Paperless keeps a document's metadata in the database, so the rows that
+belong to restored documents can be pulled out of the snapshot's plain SQL
+dump as COPY blocks that load back with psql.
+"""
+from __future__ import annotations
+
+import gzip
+import json
+import re
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Callable, Iterable, Iterator
+
+from lib.utils.file_index import FileEntry, read_index
+
+
+ORIGINALS_PREFIX = "media/documents/originals/"
+ARCHIVE_PREFIX = "media/documents/archive/"
+THUMBNAILS_PREFIX = "media/documents/thumbnails/"
+DOCUMENT_TABLE = "public.documents_document"
+COPY_ESCAPES = {"b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t", "v": "\v", "\\": "\\"}
+
+
+def path_matches(path: str, patterns: Iterable[str]) -> bool:
+    """True if path equals a pattern, lies below it, or matches it as a glob."""
+    for pattern in patterns:
+        pattern = pattern.strip("/")
+        if path == pattern or path.startswith(f"{pattern}/") or fnmatchcase(path, pattern):
+            return True
+    return False
+
+
+def locate_files(
+    indexes: Iterable[tuple[str, str, Path]], patterns: list[str]
+) -> dict[tuple[str, str], list[FileEntry]]:
+    """Map (snapshot, archive base) -> the matching files to take from that archive.
+
+    indexes are (snapshot, archive base, index file), newest snapshot first;
+    a path found in a newer archive is not looked up in older ones.
+    """
+    seen: set[str] = set()
+    found: dict[tuple[str, str], list[FileEntry]] = {}
+    for snapshot, base, index in indexes:
+        taken = [e for e in read_index(index) if e.path not in seen and path_matches(e.path, patterns)]
+        if taken:
+            seen.update(e.path for e in taken)
+            found.setdefault((snapshot, base), []).extend(taken)
+    return found
+
+
+def filter_chunk_index(index: Path, patterns: list[str], out: Path) -> int:
+    """Write the entries of a chunk index that match patterns (plus their parent dirs) to out.
+
+    Returns the number of files and links kept.
+    """
+    with gzip.open(index, "rt", encoding="utf-8") as fh:
+        entries = [(line, json.loads(line)) for line in fh if line.strip()]
+    kept, parents = [], set()
+    for line, entry in entries:
+        if path_matches(entry["path"], patterns):
+            kept.append((line, entry))
+            parts = entry["path"].split("/")
+            parents.update("/".join(parts[:i]) for i in range(1, len(parts)))
+    dirs = [
+        line for line, entry in entries
+        if entry["type"] == "dir" and entry["path"] in parents and not path_matches(entry["path"], patterns)
+    ]
+    with gzip.open(out, "wt", encoding="utf-8") as fh:
+        fh.writelines(dirs + [line for line, _ in kept])
+    return sum(1 for _, entry in kept if entry["type"] != "dir")
+
+
+def _copy_field(raw: str) -> str | None:
+    """Decode one field of COPY text format (None for \\N)."""
+    if raw == "\\N":
+        return None
+    return re.sub(r"\\(.)", lambda m: COPY_ESCAPES.get(m.group(1), m.group(1)), raw)
+
+
+def _copy_header(line: str) -> tuple[str, list[str]]:
+    """Table and column names of a `COPY table (a, "b") FROM stdin;` line."""
+    table, _, rest = line[5:].partition(" (")
+    columns = rest.rsplit(") FROM stdin", 1)[0]
+    return table.strip(), [c.strip().strip('"') for c in columns.split(",")]
+
+
+def _copy_blocks(
+    dump: Path, select: Callable[[str, list[str]], Callable[[str], bool] | None]
+) -> Iterator[tuple[str, str, list[str]]]:
+    """Yield (header line, table, kept data lines) for the selected COPY blocks of a plain dump.
+
+    select(table, columns) returns a predicate for the block's data lines,
+    or None to skip the block. Lines are filtered as they are read, so only
+    the kept rows of a large table are ever held in memory.
+    """
+    with open(dump, encoding="utf-8", errors="surrogateescape") as fh:
+        header, keep = None, None
+        rows: list[str] = []
+        for line in fh:
+            if header is not None:
+                if line.rstrip("\r\n") == "\\.":
+                    if keep is not None:
+                        yield header, table, rows
+                    header, keep, rows = None, None, []
+                elif keep is not None and keep(line):
+                    rows.append(line)
+            elif line.startswith("COPY ") and line.rstrip().endswith("FROM stdin;"):
+                header = line
+                table, columns = _copy_header(line)
+                keep = select(table, columns)
+
+
+def _field(row: str, pos: int) -> str | None:
+    """Decoded field pos of a COPY data line."""
+    return _copy_field(row.split("\t", pos + 1)[pos].rstrip("\n"))
+
+
+def document_keys(paths: Iterable[str]) -> tuple[set[str], set[str], set[int]]:
+    """(original filenames, archive filenames, ids from thumbnails) for restored media paths."""
+    originals, archived, ids = set(), set(), set()
+    for path in paths:
+        if path.startswith(ORIGINALS_PREFIX):
+            originals.add(path[len(ORIGINALS_PREFIX):])
+        elif path.startswith(ARCHIVE_PREFIX):
+            archived.add(path[len(ARCHIVE_PREFIX):])
+        elif path.startswith(THUMBNAILS_PREFIX) and Path(path).stem.isdigit():
+            ids.add(int(Path(path).stem))
+    return originals, archived, ids
+
+
+def export_document_rows(dump: Path, paths: Iterable[str], out: Path) -> int:
+    """Write the dump's rows for the documents behind paths to out; returns the document count.
+
+    Two streaming passes over the dump: the first matches documents_document
+    rows by filename, archive_filename or (thumbnails) id and stops after
+    that table; the second keeps the rows of every table with a document_id
+    column that point at those documents.
+    """
+    originals, archived, ids = document_keys(paths)
+
+    def match_documents(table: str, columns: list[str]) -> Callable[[str], bool] | None:
+        if table != DOCUMENT_TABLE:
+            return None
+        pos = {name: columns.index(name) for name in ("id", "filename", "archive_filename") if name in columns}
+
+        def keep(row: str) -> bool:
+            fields = [_copy_field(f) for f in row.rstrip("\n").split("\t")]
+            if (
+                fields[pos["id"]] is not None and int(fields[pos["id"]]) in ids
+                or "filename" in pos and fields[pos["filename"]] in originals
+                or "archive_filename" in pos and fields[pos["archive_filename"]] in archived
+            ):
+                ids.add(int(fields[pos["id"]]))
+                return True
+            return False
+        return keep
+
+    def match_related(table: str, columns: list[str]) -> Callable[[str], bool] | None:
+        if table == DOCUMENT_TABLE or "document_id" not in columns:
+            return None
+        pos = columns.index("document_id")
+        return lambda row: (value := _field(row, pos)) is not None and int(value) in ids
+
+    blocks: list[tuple[str, list[str]]] = []
+    for header, _, rows in _copy_blocks(dump, match_documents):
+        blocks.append((header, rows))
+        break  # the rest of the dump is not needed for this pass
+    documents = len(blocks[0][1]) if blocks else 0
+    if documents:
+        blocks.extend((header, rows) for header, _, rows in _copy_blocks(dump, match_related) if rows)
+    with open(out, "w", encoding="utf-8", errors="surrogateescape") as fh:
+        fh.write("-- Rows of restored Paperless documents; load with: psql -v ON_ERROR_STOP=1 -f <file>\n")
+        for header, rows in blocks:
+            fh.write(header)
+            fh.writelines(rows)
+            fh.write("\\.\n\n")
+    return documents
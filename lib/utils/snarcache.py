@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Local cache of GNU tar incremental state (.snar files).
+
+After each uploaded full/incr snapshot the .snar files it produced are kept
+under the instance's stack dir together with their sha256 and the snapshot
+name. The next incremental run copies them from there instead of fetching
+them from the parent snapshot on the remote. The same digests are written
+to the snapshot's manifest ("snar.<file>: <sha256>"), so the cache can be
+checked against the catalog entry of the latest snapshot.
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+from dataclasses import dataclass
+from pathlib import Path
+
+from lib.utils.integrity import file_sha256
+
+
+STATE_FILE = "state.json"
+MANIFEST_PREFIX = "snar."
+
+
+@dataclass
+class IncrementalState:
+    """The .snar files left by one snapshot."""
+    snapshot: str
+    digests: dict[str, str]  # filename -> sha256
+
+
+def snar_digests(work: Path) -> dict[str, str]:
+    return {snar.name: file_sha256(snar) for snar in sorted(work.glob("*.snar"))}
+
+
+def manifest_snar_digests(manifest: dict[str, str]) -> dict[str, str]:
+    return {
+        key[len(MANIFEST_PREFIX):]: value
+        for key, value in manifest.items()
+        if key.startswith(MANIFEST_PREFIX)
+    }
+
+
+def load_state(cache: Path) -> IncrementalState | None:
+    """Return the cached state if every file is present and matches its checksum."""
+    try:
+        data = json.loads((cache / STATE_FILE).read_text())
+        state = IncrementalState(data["snapshot"], data["digests"])
+    except (OSError, ValueError, KeyError, TypeError):
+        return None
+    for filename, digest in state.digests.items():
+        path = cache / filename
+        if not path.is_file() or file_sha256(path) != digest:
+            return None
+    return state
+
+
+def save_state(cache: Path, snapshot: str, work: Path, digests: dict[str, str]) -> None:
+    """Replace the cache with work's .snar files (built aside, then swapped in)."""
+    staging = cache.with_name(f"{cache.name}.new")
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    for filename in digests:
+        shutil.copy2(work / filename, staging / filename)
+    (staging / STATE_FILE).write_text(json.dumps({"snapshot": snapshot, "digests": digests}, indent=1))
+    old = cache.with_name(f"{cache.name}.old")
+    shutil.rmtree(old, ignore_errors=True)
+    if cache.exists():
+        os.rename(cache, old)
+    os.rename(staging, cache)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def copy_state(cache: Path, state: IncrementalState, work: Path) -> None:
+    for filename in state.digests:
+        shutil.copy2(cache / filename, work / filename)
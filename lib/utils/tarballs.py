@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Locating and extracting the tarballs of a downloaded tar-format snapshot.
+
+Shared by restore.py and by backup.py when it merges an incremental chain
+into a synthetic full. stream_tar() extracts a tarball that is still on the
+remote, piping `rclone cat` into tar so nothing is staged on local disk.
+"""
+from __future__ import annotations
+
+import os
+import subprocess
+import tempfile
+from pathlib import Path
+from typing import Callable, Iterable
+
+from lib.utils.compression import codec_for_file
+from lib.utils.progress import relay
+
+
+def is_tarball(filename: str) -> bool:
+    return filename.endswith(".tar") or ".tar." in filename
+
+
+def select_tarballs(filenames: Iterable[str], name: str) -> list[str]:
+    """Pick the tarballs holding `name` from a snapshot's file names.
+
+    Content-aware backups split a directory into <name>.tar.* and a
+    store-only <name>-store.tar; both are needed to restore it.
+    """
+    names = set(filenames)
+    tarballs = sorted(f for f in names if f.startswith(f"{name}.tar"))
+    if f"{name}-store.tar" in names:
+        tarballs.append(f"{name}-store.tar")
+    return tarballs
+
+
+def find_tarballs(snap_dir: Path, name: str) -> list[Path]:
+    """Return the tarballs holding `name` in a downloaded snapshot."""
+    return [snap_dir / f for f in select_tarballs((p.name for p in snap_dir.iterdir()), name)]
+
+
+def tarball_dir_name(tarball: Path) -> str:
+    """Directory a tarball belongs to: media.tar.gz and media-store.tar -> media."""
+    base = tarball.name.split(".tar", 1)[0]
+    return base[:-len("-store")] if base.endswith("-store") else base
+
+
+def extract_tar(
+    tar_path: Path, dest: Path, compression: str = "", progress: Callable[[int], None] | None = None,
+) -> None:
+    """Extract one (possibly incremental) tarball into dest.
+
+    --listed-incremental=/dev/null applies an incremental archive's
+    directory listings, so files deleted since its parent are removed.
+    progress, if given, is called with the size of every block read.
+    """
+    codec = codec_for_file(tar_path, compression)
+    if progress is None:
+        subprocess.run(
+            ["tar", "--listed-incremental=/dev/null", *codec.tar_flags(),
+             "-xpf", str(tar_path), "-C", str(dest)],
+            check=True,
+        )
+        return
+    tar_cmd = ["tar", "--listed-incremental=/dev/null", *codec.tar_flags(), "-xpf", "-", "-C", str(dest)]
+    tar = subprocess.Popen(tar_cmd, stdin=subprocess.PIPE)
+    with open(tar_path, "rb") as fh:
+        relay(fh, tar.stdin, progress)
+    if tar.wait() != 0:
+        raise subprocess.CalledProcessError(tar.returncode, tar_cmd)
+
+
+def stream_tar(
+    remote_path: str, dest: Path, compression: str = "", members: list[str] | None = None,
+    progress: Callable[[int], None] | None = None,
+) -> None:
+    """Extract a tarball straight from the remote (rclone cat | tar -x).
+
+    Download, decompression and extraction overlap and only the extracted
+    files need disk space. With members only those paths are extracted
+    (and no incremental deletions are applied). progress, if given, is
+    called with the size of every block passed on to tar. Raises
+    CalledProcessError if either side fails.
+    """
+    codec = codec_for_file(Path(remote_path), compression)
+    select = ["--listed-incremental=/dev/null"]
+    listing = None
+    if members is not None:
+        listing = tempfile.NamedTemporaryFile("wb", prefix="paperless-members.", delete=False)
+        listing.write(b"".join(os.fsencode(m) + b"\0" for m in members))
+        listing.close()
+        select = ["--null", "--verbatim-files-from", "-T", listing.name]
+    # -T must follow -C: tar applies -C to the member names after it
+    tar_cmd = ["tar", *codec.tar_flags(), "-xpf", "-", "-C", str(dest), *select]
+    cat = subprocess.Popen(["rclone", "cat", remote_path], stdout=subprocess.PIPE)
+    try:
+        if progress is None:
+            tar = subprocess.run(tar_cmd, stdin=cat.stdout, check=False)
+        else:
+            tar = subprocess.Popen(tar_cmd, stdin=subprocess.PIPE)
+            try:
+                relay(cat.stdout, tar.stdin, progress)
+            finally:
+                tar.wait()
+    finally:
+        cat.stdout.close()
+        cat.wait()
+        if listing:
+            os.unlink(listing.name)
+    if cat.returncode != 0 or tar.returncode != 0:
+        raise subprocess.CalledProcessError(
+            tar.returncode or cat.returncode, f"rclone cat {remote_path} | tar -x"
+        )